@@ -1,17 +1,31 @@
+from collections import defaultdict
+from contextlib import nullcontext
+from datetime import date
+
 from django.contrib import admin
+from django.db import router, transaction
+from django.db.models import Count, Q
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.safestring import mark_safe
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 from django import forms
 
-from attendance.constants import STATUS_CHOICES
-from attendance.models import Repetition, AttendanceRecord
+from attendance.calendar_cache import touch_record_calendar, touch_record_calendars
+from attendance.constants import CHANGE_SOURCE_ADMIN, STATUS_CHOICES
+from attendance.events import publish_changes, record_change
+from attendance.journal import journal_batch, log_change
+from attendance.models import Repetition, AttendanceRecord, AttendanceArchive, AttendanceChange
+from attendance.paginators import LargeTablePaginator
+from attendance.utils import get_academic_year_dates
+from students.models import Group
 
 
 class AttendanceRecordInlineForm(forms.ModelForm):
     class Meta:
         model = AttendanceRecord
-        fields = ['student', 'present', 'status', 'notes']
+        fields = ['student', 'status', 'notes']
         widgets = {
             'status': forms.RadioSelect(choices=STATUS_CHOICES),
         }
@@ -28,43 +42,59 @@ class AttendanceRecordInline(admin.TabularInline):
         qs = super().get_queryset(request)
         return qs.select_related('student').order_by('student__last_name')
 
-    def formfield_for_foreignkey(self, db_field, request, **kwargs):
-        if db_field.name == "student":
-            # Получаем ID репетиции из URL
-            repetition_id = request.resolver_match.kwargs.get('object_id')
-            if repetition_id:
-                # Фильтруем студентов только из группы этой репетиции
-                repetition = Repetition.objects.get(id=repetition_id)
-                kwargs["queryset"] = repetition.group.students.order_by('last_name')
-        return super().formfield_for_foreignkey(db_field, request, **kwargs)
-
-    fields = ('student_link', 'present', 'status', 'notes')
+    fields = ('student_link', 'status', 'notes')
     readonly_fields = ('student_link',)
 
+    @cached_property
+    def student_url_template(self):
+        """Адрес страницы участника с меткой вместо id: reverse выполняется один раз"""
+
+        return reverse("admin:students_student_change", args=['__id__'])
+
     def student_link(self, obj):
-        link = reverse("admin:students_student_change", args=[obj.student.id])
+        link = self.student_url_template.replace('__id__', str(obj.student_id))
         return format_html('<a href="{}">{}</a>', link, obj.student.full_name)
 
     student_link.short_description = 'Участник'
 
     def get_fields(self, request, obj=None):
         if obj:  # Если объект уже существует
-            return ('student_link', 'present', 'status', 'notes')
+            return ('student_link', 'status', 'notes')
         return super().get_fields(request, obj)
 
 
+class AttendanceJournalMixin:
+    """Изменения посещаемости, сделанные в админке за один запрос, пишутся в журнал одной пачкой.
+
+    Транзакция открывается снаружи journal_batch: журнал записывается до фиксации и
+    откатывается вместе с отметками (транзакция админки внутри становится вложенной)."""
+
+    def journal_transaction(self, request):
+        if request.method != 'POST':
+            return nullcontext()
+        return transaction.atomic(using=router.db_for_write(self.model))
+
+    def changeform_view(self, request, *args, **kwargs):
+        with self.journal_transaction(request), journal_batch(request.user, CHANGE_SOURCE_ADMIN):
+            return super().changeform_view(request, *args, **kwargs)
+
+    def changelist_view(self, request, *args, **kwargs):
+        with self.journal_transaction(request), journal_batch(request.user, CHANGE_SOURCE_ADMIN):
+            return super().changelist_view(request, *args, **kwargs)
+
+
 @admin.register(Repetition)
-class RepetitionAdmin(admin.ModelAdmin):
+class RepetitionAdmin(AttendanceJournalMixin, admin.ModelAdmin):
     """ Модель репетиции в админке Django """
 
     list_display = ('date', 'group_link', 'start_time', 'duration_display', 'attendance_count', 'created_at')
-    list_filter = ('date', 'group', 'duration')
+    list_filter = ('date', 'group', 'duration', 'hall')
     search_fields = ('group__age_category', 'group__year', 'notes')
     date_hierarchy = 'date'
     ordering = ('-date', 'start_time')
     fieldsets = (
         (None, {
-            'fields': ('date', 'start_time', 'duration', 'group')
+            'fields': ('date', 'start_time', 'duration', 'group', 'hall')
         }),
         ('Дополнительно', {
             'fields': ('notes', 'attendance_summary'),
@@ -77,24 +107,12 @@ class RepetitionAdmin(admin.ModelAdmin):
 
     def create_attendance_records(self, request, queryset):
         for repetition in queryset:
-            existing_records = set(repetition.attendance_records.values_list('student_id', flat=True))
-            students_to_add = repetition.group.students.exclude(id__in=existing_records)
-
-            created = 0
-            for student in students_to_add:
-                AttendanceRecord.objects.create(
-                    repetition=repetition,
-                    student=student,
-                    present=False,
-                    status='absent'
-                )
-                created += 1
-
+            created = len(repetition.create_missing_records())
             self.message_user(request, f"Для {repetition} создано {created} записей")
     create_attendance_records.short_description = "Создать записи посещаемости для всех студентов"
 
     def group_link(self, obj):
-        link = reverse("admin:students_group_change", args=[obj.group.id])
+        link = reverse("admin:students_group_change", args=[obj.group_id])
         return mark_safe(f'<a href="{link}">{obj.group}</a>')
     group_link.short_description = 'Группа'
 
@@ -103,19 +121,20 @@ class RepetitionAdmin(admin.ModelAdmin):
     duration_display.short_description = 'Длительность'
 
     def attendance_count(self, obj):
-        count = obj.attendance_records.count()
         link = reverse("admin:attendance_attendancerecord_changelist") + f"?repetition__id__exact={obj.id}"
-        return mark_safe(f'<a href="{link}">{count} записей</a>')
+        return mark_safe(f'<a href="{link}">{obj.records_count} записей</a>')
     attendance_count.short_description = 'Посещаемость'
 
     def attendance_summary(self, obj):
-        presents = obj.attendance_records.filter(present=True).count()
-        total = obj.attendance_records.count()
+        stats = obj.attendance_records.aggregate(total=Count('id'), presents=Count('id', filter=Q(present=True)))
+        presents, total = stats['presents'], stats['total']
         return f"Присутствовало: {presents}/{total} ({round(presents/total*100) if total else 0}%)"
     attendance_summary.short_description = 'Статистика посещаемости'
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related('group')
+        return super().get_queryset(request).select_related('group').annotate(
+            records_count=Count('attendance_records')
+        )
 
     def save_formset(self, request, form, formset, change):
         # Автоматическое создание записей посещаемости при создании репетиции
@@ -128,16 +147,7 @@ class RepetitionAdmin(admin.ModelAdmin):
 
         # Создаем отсутствующие записи для всех студентов группы
         if not change:  # Только при создании новой репетиции
-            existing_students = set(form.instance.attendance_records.values_list('student_id', flat=True))
-            all_students = form.instance.group.students.values_list('id', flat=True)
-
-            for student_id in set(all_students) - existing_students:
-                AttendanceRecord.objects.create(
-                    repetition=form.instance,
-                    student_id=student_id,
-                    present=False,
-                    status='absent'
-                )
+            form.instance.create_missing_records()
 
 
 class AttendanceStatusFilter(admin.SimpleListFilter):
@@ -157,6 +167,43 @@ class AttendanceStatusFilter(admin.SimpleListFilter):
             return queryset.filter(status=self.value())
 
 
+class AcademicYearFilter(admin.SimpleListFilter):
+    """Фильтр по учебному году: диапазон по repetition_date читает одну секцию таблицы"""
+
+    title = 'Учебный год'
+    parameter_name = 'academic_year'
+
+    def lookups(self, request, model_admin):
+        current = get_academic_year_dates()[0].year
+        return [(str(year), f'{year}/{year + 1}') for year in range(current, current - 5, -1)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            start_date, end_date = get_academic_year_dates(date(int(self.value()), 6, 1))
+            return queryset.filter(repetition_date__gte=start_date, repetition_date__lte=end_date)
+
+
+class GroupFilter(admin.SimpleListFilter):
+    """Фильтр по группе: список строится по небольшой таблице групп, а не по записям.
+
+    В списке все группы - сначала действующие, затем закрытые (переводом на новый
+    учебный год), чтобы записи прошлых лет тоже можно было отфильтровать по группе."""
+
+    title = 'Группа'
+    parameter_name = 'group'
+
+    def lookups(self, request, model_admin):
+        groups = Group.objects.order_by('-is_active', 'year', 'age_category', 'gender')
+        return [
+            (str(group.pk), str(group) if group.is_active else f'{group} (закрыта)')
+            for group in groups
+        ]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(repetition__group_id=self.value())
+
+
 class AttendanceRecordForm(forms.ModelForm):
     class Meta:
         model = AttendanceRecord
@@ -167,13 +214,21 @@ class AttendanceRecordForm(forms.ModelForm):
 
 
 @admin.register(AttendanceRecord)
-class AttendanceRecordAdmin(admin.ModelAdmin):
+class AttendanceRecordAdmin(AttendanceJournalMixin, admin.ModelAdmin):
     form = AttendanceRecordForm
-    list_display = ('student', 'repetition_link', 'status_icon', 'present', 'notes_short', 'updated_at')
-    list_filter = (AttendanceStatusFilter, 'present', 'repetition__date', 'repetition__group')
-    search_fields = ('student__last_name', 'student__first_name', 'notes')
-    list_editable = ('present',)
+    list_display = ('student', 'repetition_link', 'status_icon', 'status', 'present', 'notes_short', 'updated_at')
+    list_filter = (AttendanceStatusFilter, AcademicYearFilter, ('repetition_date', admin.DateFieldListFilter),
+                   GroupFilter)
+    # Поиск по началу фамилии/имени: LIKE 'X%' вместо '%X%' по каждой записи
+    search_fields = ('^student__last_name', '^student__first_name')
+    search_help_text = 'Начало фамилии или имени участника'
+    list_editable = ('status',)
     list_select_related = ('student', 'repetition', 'repetition__group')
+    autocomplete_fields = ('repetition', 'student')
+    # Сортировка совпадает с индексом (repetition_date, id), полный COUNT(*) не выполняется
+    ordering = ('-repetition_date', '-id')
+    paginator = LargeTablePaginator
+    show_full_result_count = False
     actions = ['mark_present', 'mark_absent']
 
     fieldsets = (
@@ -181,7 +236,7 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
             'fields': ('repetition', 'student')
         }),
         ('Посещаемость', {
-            'fields': ('present', 'status', 'notes')
+            'fields': ('status', 'notes')
         }),
     )
 
@@ -208,13 +263,13 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
     notes_short.short_description = 'Комментарий'
 
     def mark_present(self, request, queryset):
-        updated = queryset.update(present=True, status='present')
+        updated = self.update_status(queryset, 'present')
         self.message_user(request, f"{updated} записей отмечены как присутствовал")
 
     mark_present.short_description = "Отметить как присутствовал"
 
     def mark_absent(self, request, queryset):
-        updated = queryset.update(present=False, status='absent')
+        updated = self.update_status(queryset, 'absent')
         self.message_user(request, f"{updated} записей отмечены как отсутствовал")
 
     mark_absent.short_description = "Отметить как отсутствовал"
@@ -222,7 +277,106 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related(
             'student', 'repetition', 'repetition__group'
-        ).order_by('-repetition__date', 'student__last_name')
+        )
+
+    def delete_model(self, request, obj):
+        touch_record_calendar(obj)
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        # Сигналы удаления записей не подключены (см. attendance/signals.py)
+        touch_record_calendars(queryset)
+        super().delete_queryset(request, queryset)
+
+    def update_status(self, queryset, status):
+        """Массово меняет статус одним UPDATE.
+
+        update() обходит сигналы и auto_now, поэтому версия календаря, журнал изменений,
+        открытые страницы отметки и updated_at (по нему работает выгрузка) обновляются здесь явно.
+
+            Возвращает:
+                int: Число обновленных записей"""
+
+        previous = list(queryset.exclude(status=status).values_list('pk', 'repetition_id', 'student_id', 'status'))
+        touch_record_calendars(queryset)
+        updated = queryset.update(status=status, updated_at=timezone.now())
+        changed_at = timezone.now()
+        for pk, repetition_id, student_id, old_status in previous:
+            log_change(pk, repetition_id, student_id, old_status, status, changed_at)
+        self.publish_statuses(queryset)
+        return updated
+
+    @staticmethod
+    def publish_statuses(queryset):
+        """Отправляет новые статусы открытым страницам отметки (update() обходит сигналы)"""
+
+        changes = defaultdict(list)
+        for repetition_id, student_id, status, notes in queryset.values_list(
+                'repetition_id', 'student_id', 'status', 'notes'):
+            changes[repetition_id].append(record_change(student_id, status, notes))
+        for repetition_id, repetition_changes in changes.items():
+            publish_changes(repetition_id, repetition_changes)
+
+
+@admin.register(AttendanceArchive)
+class AttendanceArchiveAdmin(admin.ModelAdmin):
+    """Архив посещаемости выбывших участников (только просмотр)"""
+
+    list_display = ('student', 'records_count', 'present_count', 'late_count', 'absent_count', 'excused_count',
+                    'first_date', 'last_date', 'archived_at')
+    list_select_related = ('student',)
+    search_fields = ('student__last_name', 'student__first_name')
+    date_hierarchy = 'last_date'
+    fields = ('student', 'records_count', 'present_count', 'late_count', 'absent_count', 'excused_count',
+              'first_date', 'last_date', 'archived_at', 'records_table')
+    readonly_fields = fields
+
+    def records_table(self, obj):
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>',
+            ((record['date'], record['start_time'], dict(STATUS_CHOICES).get(record['status'], record['status']),
+              record['notes']) for record in obj.records)
+        )
+        return format_html('<table><tr><th>Дата</th><th>Время</th><th>Статус</th><th>Комментарий</th></tr>{}</table>',
+                           rows)
+
+    records_table.short_description = 'Записи'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(AttendanceChange)
+class AttendanceChangeAdmin(admin.ModelAdmin):
+    """Журнал изменений посещаемости (только просмотр)"""
+
+    list_display = ('changed_at', 'student', 'repetition', 'old_status_display', 'new_status_display', 'user',
+                    'source')
+    list_filter = ('source', ('changed_at', admin.DateFieldListFilter))
+    list_select_related = ('student', 'repetition', 'repetition__group', 'user')
+    search_fields = ('^student__last_name', '^student__first_name')
+    ordering = ('-changed_at', '-id')
+    paginator = LargeTablePaginator
+    show_full_result_count = False
+
+    def old_status_display(self, obj):
+        return obj.get_old_status_display() or 'Запись создана'
+
+    old_status_display.short_description = 'Было'
+
+    def new_status_display(self, obj):
+        return obj.get_new_status_display()
+
+    new_status_display.short_description = 'Стало'
 
+    def has_add_permission(self, request):
+        return False
 
+    def has_change_permission(self, request, obj=None):
+        return False
 
+    def has_delete_permission(self, request, obj=None):
+        return False
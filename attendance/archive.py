@@ -0,0 +1,108 @@
+from collections import defaultdict
+from datetime import date
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from attendance.calendar_cache import touch_calendar
+from attendance.models import AttendanceArchive, AttendanceRecord
+from attendance.utils import get_academic_year_dates
+from students.constants import STATUS_EXPELLED, STATUS_GRADUATE, STATUS_PARTICIPANT
+from students.models import Student
+
+
+def sync_student_statuses(today=None):
+    """Проставляет статусы по датам отчисления и году выпуска (двумя UPDATE).
+
+    Отчисленным считается участник с датой отчисления не позже today, выпускником -
+    участник, чей год выпуска уже завершился (наступил учебный год, начинающийся в
+    graduation_year).
+
+        Возвращает:
+            tuple: (число отчисленных, число выпускников)"""
+
+    today = today or date.today()
+    academic_year = get_academic_year_dates(today)[0].year
+    participants = Student.objects.filter(status=STATUS_PARTICIPANT)
+    leaving = participants.filter(expulsion_date__lte=today) | participants.filter(graduation_year__lte=academic_year)
+    with transaction.atomic():
+        # Составы групп меняются в обход save(): версии их календарей меняем явно
+        for group_id in set(leaving.values_list('group_id', flat=True)):
+            touch_calendar(group_id)
+        expelled = participants.filter(expulsion_date__lte=today).update(status=STATUS_EXPELLED)
+        graduated = participants.filter(graduation_year__lte=academic_year).update(status=STATUS_GRADUATE)
+    return expelled, graduated
+
+
+def students_to_archive():
+    """Выбывшие участники, у которых в основной таблице еще остались записи"""
+
+    return Student.objects.inactive().filter(
+        Exists(AttendanceRecord.objects.filter(student=OuterRef('pk')))
+    ).order_by('pk')
+
+
+def _build_archive(student_id, rows, existing):
+    """Собирает объект архива из строк основной таблицы и уже существующего архива"""
+
+    packed = existing.unpack() if existing else []
+    packed.extend(rows)
+    packed.sort(key=lambda row: (row[0], row[1]))
+
+    counts = defaultdict(int)
+    for row in packed:
+        counts[row[3]] += 1
+    return AttendanceArchive(
+        student_id=student_id,
+        records_count=len(packed),
+        present_count=counts['present'],
+        late_count=counts['late'],
+        absent_count=counts['absent'],
+        excused_count=counts['excused'],
+        first_date=date.fromisoformat(packed[0][0]),
+        last_date=date.fromisoformat(packed[-1][0]),
+        payload=AttendanceArchive.pack(packed),
+    )
+
+
+def archive_students(student_ids, batch_size=200):
+    """Переносит историю посещаемости участников в AttendanceArchive.
+
+    Участники обрабатываются пачками: на каждую пачку один SELECT записей, один
+    upsert архивов и один DELETE из основной таблицы в общей транзакции. Повторный
+    запуск дописывает в архив записи, появившиеся после предыдущей архивации.
+
+        Возвращает:
+            int: Сколько записей перенесено в архив"""
+
+    moved = 0
+    student_ids = iter(student_ids)
+    while batch := list(islice(student_ids, batch_size)):
+        with transaction.atomic():
+            rows_by_student = defaultdict(list)
+            records = AttendanceRecord.objects.filter(student_id__in=batch).values_list(
+                'student_id', 'repetition_date', 'repetition__start_time', 'repetition__group_id', 'status', 'notes'
+            )
+            for student_id, day, start_time, group_id, status, notes in records:
+                rows_by_student[student_id].append(
+                    [day.isoformat(), start_time.strftime('%H:%M'), group_id, status, notes]
+                )
+            if not rows_by_student:
+                continue
+
+            existing = AttendanceArchive.objects.in_bulk(list(rows_by_student), field_name='student_id')
+            archives = [
+                _build_archive(student_id, rows, existing.get(student_id))
+                for student_id, rows in rows_by_student.items()
+            ]
+            AttendanceArchive.objects.bulk_create(
+                archives,
+                update_conflicts=True,
+                unique_fields=['student'],
+                update_fields=['records_count', 'present_count', 'late_count', 'absent_count', 'excused_count',
+                               'first_date', 'last_date', 'payload', 'archived_at'],
+            )
+            deleted, _ = AttendanceRecord.objects.filter(student_id__in=list(rows_by_student)).delete()
+            moved += deleted
+    return moved
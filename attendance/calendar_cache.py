@@ -0,0 +1,159 @@
+"""Кеш матриц календаря посещаемости.
+
+Ключ матрицы содержит версию данных месяца - счетчики CalendarVersion месяца и
+состава группы, которые читаются одним запросом по уникальному индексу. Счетчики
+увеличивает touch_calendar() в той же транзакции, что и изменения: сигналы
+сохранения отметок, занятий и участников, а также код, который меняет их в обход
+сигналов (update(), bulk_create/bulk_update, удаление в админке, архивация, перевод
+групп). Поэтому запись в любом процессе меняет ключ, и кеш корректен и с локальным
+кешем процесса при нескольких воркерах gunicorn - они только не делят построенные
+матрицы. Устаревшие ключи просто истекают.
+
+Месяцы, закончившиеся больше CALENDAR_CLOSED_AFTER_DAYS дней назад, считаются
+закрытыми: при общем кеше (CACHE_IS_SHARED) их матрицы хранятся без срока действия.
+
+Матрицы соседних месяцев прогреваются в фоновом пуле потоков, поэтому переход
+«предыдущий/следующий месяц» обычно обслуживается из кеша."""
+
+import calendar
+import contextvars
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Subquery
+
+from attendance.calendar_data import build_calendar_matrix
+from attendance.models import AttendanceRecord, CalendarVersion, Repetition
+from monitoring import slow_queries
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'attendance:calendar'
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='calendar-prefetch')
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def is_closed_month(year, month, today):
+    last_day = date(year, month, calendar.monthrange(year, month)[1])
+    return (today - last_day).days > settings.CALENDAR_CLOSED_AFTER_DAYS
+
+
+def first_day(day):
+    return date(day.year, day.month, 1)
+
+
+def data_version(group_id, year, month):
+    """Версия данных матрицы: счетчики состава группы и месяца одним запросом.
+
+    Версия читается из той же базы, что и матрица: снимок с отстающей реплики получает
+    ключ ее версии и перестает использоваться, когда реплика догонит основную базу."""
+
+    month_start = date(year, month, 1)
+    versions = dict(CalendarVersion.objects.filter(
+        group_id=group_id, month__in=[CalendarVersion.ROSTER, month_start]
+    ).values_list('month', 'version'))
+    return f'{versions.get(CalendarVersion.ROSTER, 0)}.{versions.get(month_start, 0)}'
+
+
+def _bump(versions):
+    return versions.update(version=F('version') + 1)
+
+
+def touch_calendar(group_id, day=None):
+    """Меняет версию календаря группы за месяц day, без day - версию состава (всех месяцев).
+
+    Вызывается внутри транзакции изменения: строка версии блокируется до ее конца."""
+
+    month = first_day(day) if day else CalendarVersion.ROSTER
+    versions = CalendarVersion.objects.filter(group_id=group_id, month=month)
+    if not _bump(versions):
+        CalendarVersion.objects.bulk_create([CalendarVersion(group_id=group_id, month=month)], ignore_conflicts=True)
+        _bump(versions)
+
+
+def touch_record_calendar(record):
+    """Меняет версию месяца записи посещаемости, не загружая занятие"""
+
+    if AttendanceRecord.repetition.is_cached(record):
+        touch_calendar(record.repetition.group_id, record.repetition_date)
+        return
+    group = Repetition.objects.filter(pk=record.repetition_id).values('group_id')
+    if not _bump(CalendarVersion.objects.filter(group_id=Subquery(group), month=first_day(record.repetition_date))):
+        touch_calendar(group.get()['group_id'], record.repetition_date)
+
+
+def touch_record_calendars(records):
+    """Меняет версии месяцев записей queryset (перед update() или удалением)"""
+
+    months = {
+        (group_id, first_day(day))
+        for group_id, day in records.values_list('repetition__group_id', 'repetition_date').order_by().distinct()
+    }
+    for group_id, month in months:
+        touch_calendar(group_id, month)
+
+
+def matrix_key(group_id, year, month, today):
+    key = f'{CACHE_PREFIX}:{group_id}:{year}-{month:02d}:{data_version(group_id, year, month)}'
+    if (year, month) == (today.year, today.month):
+        # В текущем месяце подсвечивается сегодняшняя колонка
+        key += f':{today.day}'
+    return key
+
+
+def get_calendar_matrix(group_id, year, month, today=None):
+    """Матрица календаря из кеша; при промахе строится и кешируется"""
+
+    today = today or date.today()
+    key = matrix_key(group_id, year, month, today)
+    matrix = cache.get(key)
+    if matrix is None:
+        matrix = build_calendar_matrix(group_id, year, month, today)
+        # Бессрочно хранится только общий кеш: в кеше процесса снимки копились бы до вытеснения
+        closed = is_closed_month(year, month, today) and settings.CACHE_IS_SHARED
+        timeout = None if closed else settings.CALENDAR_CACHE_TIMEOUT
+        cache.set(key, matrix, timeout)
+    return matrix
+
+
+def adjacent_months(year, month):
+    first_day = date(year, month, 1)
+    previous = first_day - timedelta(days=1)
+    following = first_day + timedelta(days=32)
+    return (previous.year, previous.month), (following.year, following.month)
+
+
+def _warm(group_id, year, month, today):
+    try:
+        with slow_queries.collect('calendar-prefetch'):
+            get_calendar_matrix(group_id, year, month, today)
+    except Exception:
+        logger.exception('Не удалось прогреть календарь группы %s за %s.%s', group_id, month, year)
+    finally:
+        # Поток пула живет долго: соединение с БД закрываем, чтобы не держать его открытым
+        connection.close()
+        with _pending_lock:
+            _pending.discard((group_id, year, month))
+
+
+def prefetch_adjacent_months(group_id, year, month, today=None):
+    """Ставит в фоновую очередь прогрев предыдущего и следующего месяцев"""
+
+    if not settings.CALENDAR_PREFETCH:
+        return
+    today = today or date.today()
+    for adjacent_year, adjacent_month in adjacent_months(year, month):
+        task = (group_id, adjacent_year, adjacent_month)
+        with _pending_lock:
+            if task in _pending:
+                continue
+            _pending.add(task)
+        # Копия контекста переносит в поток пула выбор базы (use_reporting) текущего запроса
+        _executor.submit(contextvars.copy_context().run, _warm, group_id, adjacent_year, adjacent_month, today)
@@ -0,0 +1,141 @@
+"""Подготовка данных для календаря посещаемости группы.
+
+Все, что шаблон раньше вычислял для каждой ячейки (день недели, выходной/сегодня,
+иконка и подпись статуса), считается здесь один раз: для заголовка - по колонке,
+для ячейки - готовый HTML. Различных ячеек в месяце не больше, чем колонок, умноженных
+на число статусов, поэтому каждая из них форматируется один раз и переиспользуется.
+Результат состоит только из строк и списков, поэтому его можно класть в кеш как есть."""
+
+from datetime import date
+
+from django.urls import reverse
+from django.utils.html import format_html
+
+from attendance.models import AttendanceRecord, Repetition
+from students.constants import GENDER_FEMALE, GENDER_MALE
+from students.models import Student
+
+WEEKDAY_LABELS = ('Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс')
+
+# Статус -> (класс иконки, подпись)
+STATUS_TOKENS = {
+    'present': ('bi-check-circle-fill status-present', 'Присутствовал'),
+    'absent': ('bi-x-circle-fill status-absent', 'Отсутствовал'),
+    'late': ('bi-clock-fill status-late', 'Опоздал'),
+    'excused': ('bi-check-circle-fill status-excused', 'По уважительной причине'),
+}
+
+GENDER_ICONS = {
+    GENDER_FEMALE: 'bi-gender-female text-pink',
+    GENDER_MALE: 'bi-gender-male text-primary',
+}
+
+
+def column_css(day, today):
+    """CSS-классы колонки: выходной и сегодняшний день"""
+
+    classes = ['date-cell']
+    if day.weekday() >= 5:
+        classes.append('weekend')
+    if day == today:
+        classes.append('today')
+    return ' '.join(classes)
+
+
+def build_columns(repetition_dates, today):
+    """Заголовки колонок: по одной на занятие"""
+
+    return [
+        {'day': f'{day.day:02d}', 'weekday': WEEKDAY_LABELS[day.weekday()], 'css': column_css(day, today)}
+        for day in repetition_dates
+    ]
+
+
+def render_cell(css, status):
+    """HTML ячейки календаря для статуса (None - отметки нет)"""
+
+    if status in STATUS_TOKENS:
+        icon, title = STATUS_TOKENS[status]
+        return format_html('<td class="{}"><i class="bi {}" title="{}"></i></td>', css, icon, title)
+    return format_html('<td class="{}"><span class="text-muted">-</span></td>', css)
+
+
+def build_rows(students, repetition_ids, column_classes, statuses):
+    """Строки календаря.
+
+        Аргументы:
+            students (iterable): Кортежи (id, полное имя, пол)
+            repetition_ids (list): id занятий в порядке колонок
+            column_classes (list): CSS-классы колонок в том же порядке
+            statuses (dict): {(student_id, repetition_id): статус}
+
+        Возвращает:
+            list: Словари с именем, ссылкой на историю, иконкой пола и готовым HTML ячеек"""
+
+    rendered = {}
+    rows = []
+    # reverse выполняется один раз, id участника подставляется в готовый адрес
+    history_url = reverse('attendance:student_history', args=[0])
+    for student_id, full_name, gender in students:
+        cells = []
+        for repetition_id, css in zip(repetition_ids, column_classes):
+            key = (css, statuses.get((student_id, repetition_id)))
+            if key not in rendered:
+                rendered[key] = render_cell(*key)
+            cells.append(rendered[key])
+        rows.append({
+            'name': full_name,
+            'history_url': history_url.replace('/0/', f'/{student_id}/', 1),
+            'gender_icon': GENDER_ICONS.get(gender, ''),
+            'cells': ''.join(cells),
+        })
+    return rows
+
+
+def build_calendar_matrix(group_id, year, month, today=None):
+    """Матрица посещаемости группы за месяц.
+
+    Три запроса: занятия месяца, активные участники группы и статусы всех их отметок
+    за месяц (values_list, без создания экземпляров моделей).
+
+        Аргументы:
+            group_id (int): id группы
+            year (int): Год
+            month (int): Месяц
+            today (date, optional): Дата для подсветки колонки «сегодня»
+
+        Возвращает:
+            dict: {'columns': [...], 'rows': [...]}"""
+
+    today = today or date.today()
+    repetitions = list(
+        Repetition.objects.filter(group_id=group_id, date__year=year, date__month=month)
+        .order_by('date', 'start_time')
+        .values_list('id', 'date')
+    )
+    repetition_ids = [repetition_id for repetition_id, _ in repetitions]
+    columns = build_columns([day for _, day in repetitions], today)
+
+    students = [
+        (student.id, student.full_name, student.gender)
+        for student in Student.objects.active().filter(group_id=group_id)
+        .only('id', 'last_name', 'first_name', 'middle_name', 'gender')
+        .order_by('last_name', 'first_name')
+    ]
+
+    statuses = {}
+    if repetition_ids:
+        first_day, last_day = repetitions[0][1], repetitions[-1][1]
+        statuses = {
+            (student_id, repetition_id): status
+            for student_id, repetition_id, status in AttendanceRecord.objects.filter(
+                repetition_id__in=repetition_ids,
+                repetition_date__gte=first_day,
+                repetition_date__lte=last_day,
+            ).values_list('student_id', 'repetition_id', 'status')
+        }
+
+    return {
+        'columns': columns,
+        'rows': build_rows(students, repetition_ids, [column['css'] for column in columns], statuses),
+    }
@@ -11,4 +11,22 @@ STATUS_CHOICES = [
     ('absent', 'Отсутствовал'),
     ('late', 'Опоздал'),
     ('excused', 'По уважительной причине'),
-]
\ No newline at end of file
+]
+# Статусы, при которых участник считается присутствовавшим на занятии
+PRESENT_STATUSES = ['present', 'late']
+
+# Компактные коды статусов для журнала изменений (AttendanceChange)
+STATUS_CODES = {'present': 1, 'absent': 2, 'late': 3, 'excused': 4}
+STATUS_BY_CODE = {code: status for status, code in STATUS_CODES.items()}
+
+# Откуда пришло изменение посещаемости
+CHANGE_SOURCE_FORM = 1
+CHANGE_SOURCE_QUICK = 2
+CHANGE_SOURCE_ADMIN = 3
+CHANGE_SOURCE_SYSTEM = 4
+CHANGE_SOURCE_CHOICES = [
+    (CHANGE_SOURCE_FORM, 'Форма отметки'),
+    (CHANGE_SOURCE_QUICK, 'Быстрая отметка'),
+    (CHANGE_SOURCE_ADMIN, 'Админка'),
+    (CHANGE_SOURCE_SYSTEM, 'Система'),
+]
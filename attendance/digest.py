@@ -0,0 +1,145 @@
+"""Сводка пропусков для педагогов.
+
+Пропускающие участники находятся одним агрегирующим запросом по всем группам за
+период: для каждого действующего участника считаются число отметок, присутствий и
+текущая серия пропусков (отсутствия после последнего присутствия; уважительная
+причина серию не прерывает и не продолжает). Дальше код работает только со
+строками пропускающих - имена, группы и педагоги подгружаются для них, поэтому
+время работы растет с числом пропускающих, а не с числом отметок.
+
+Каждый педагог получает одно письмо по всем своим группам; письма уходят пачками
+через одно соединение с почтовым сервером."""
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db import connections, router
+from django.template.loader import render_to_string
+from django.urls import reverse
+
+from attendance.constants import PRESENT_STATUSES
+from attendance.models import AttendanceRecord
+from students.constants import STATUS_PARTICIPANT
+from students.models import Group, Student
+
+
+def absentees_sql(connection):
+    """Запрос пропускающих: строки (student_id, group_id, отметок, присутствий, серия, последняя дата)"""
+
+    present = ', '.join(f"'{status}'" for status in PRESENT_STATUSES)
+    total = 'COUNT(*)'
+    present_count = f'COUNT(CASE WHEN status IN ({present}) THEN 1 END)'
+    streak = (
+        "COUNT(CASE WHEN status = 'absent' AND (last_present IS NULL OR repetition_date > last_present) THEN 1 END)"
+    )
+    return (
+        f'WITH recent AS (\n'
+        f'    SELECT record.student_id, student.group_id, record.repetition_date, record.status,\n'
+        f'        MAX(CASE WHEN record.status IN ({present}) THEN record.repetition_date END)\n'
+        f'            OVER (PARTITION BY record.student_id) AS last_present\n'
+        f'    FROM attendance_attendancerecord record\n'
+        f'    JOIN students_student student ON student.id = record.student_id\n'
+        f'    WHERE record.repetition_date BETWEEN %s AND %s AND student.status = %s\n'
+        f')\n'
+        f'SELECT student_id, group_id, {total}, {present_count}, {streak}, MAX(repetition_date)\n'
+        f'FROM recent\n'
+        f'GROUP BY student_id, group_id\n'
+        f'HAVING {streak} >= %s OR ({total} >= %s AND {present_count} * 100 < %s * {total})\n'
+        f'ORDER BY group_id, student_id'
+    )
+
+
+def find_absentees(start, end, streak=None, rate=None, min_records=None):
+    """Участники с серией пропусков от streak или посещаемостью ниже rate% за период.
+
+    Процент считается только у тех, у кого за период не меньше min_records отметок.
+
+        Возвращает:
+            list: dict с полями student, group_id, total, present, rate, streak, last_date"""
+
+    streak = streak or settings.ABSENTEE_STREAK
+    rate = settings.ABSENTEE_RATE if rate is None else rate
+    min_records = min_records or settings.ABSENTEE_MIN_RECORDS
+
+    connection = connections[router.db_for_read(AttendanceRecord)]
+    with connection.cursor() as cursor:
+        cursor.execute(absentees_sql(connection), [start, end, STATUS_PARTICIPANT, streak, min_records, rate])
+        rows = cursor.fetchall()
+
+    students = Student.objects.in_bulk([row[0] for row in rows])
+    return [
+        {
+            'student': students[student_id],
+            'group_id': group_id,
+            'total': total,
+            'present': present,
+            'rate': round(present / total * 100),
+            'streak': absences,
+            'last_date': last_date,
+        }
+        for student_id, group_id, total, present, absences, last_date in rows
+        if student_id in students
+    ]
+
+
+def group_digests(absentees):
+    """Раскладывает пропускающих по педагогам их групп.
+
+        Возвращает:
+            tuple: (список (педагог, [(группа, [пропускающие])]), группы без педагога с email)"""
+
+    by_group = defaultdict(list)
+    for absentee in absentees:
+        absentee['history_url'] = settings.SITE_URL + reverse(
+            'attendance:student_history', args=[absentee['student'].pk]
+        )
+        by_group[absentee['group_id']].append(absentee)
+
+    groups = Group.objects.in_bulk(list(by_group))
+    teachers = defaultdict(list)
+    for group_id, user_id in Group.teachers.through.objects.filter(group_id__in=list(by_group)).values_list(
+            'group_id', 'user_id'):
+        teachers[user_id].append(group_id)
+    users = get_user_model().objects.filter(pk__in=list(teachers), is_active=True).exclude(email='').in_bulk()
+
+    digests = []
+    covered = set()
+    for user_id, group_ids in teachers.items():
+        if user_id not in users:
+            continue
+        covered.update(group_ids)
+        digests.append((users[user_id], [(groups[group_id], by_group[group_id]) for group_id in sorted(group_ids)]))
+    orphaned = [groups[group_id] for group_id in by_group if group_id not in covered]
+    return digests, orphaned
+
+
+def digest_messages(digests, start, end):
+    """Письмо каждому педагогу"""
+
+    subject = f'Пропуски репетиций {start:%d.%m}-{end:%d.%m.%Y}'
+    return [
+        EmailMessage(
+            subject,
+            render_to_string('attendance/emails/absentee_digest.txt', {
+                'teacher': teacher, 'groups': groups, 'start': start, 'end': end,
+            }),
+            to=[teacher.email],
+        )
+        for teacher, groups in digests
+    ]
+
+
+def send_in_batches(messages, batch_size=None):
+    """Отправляет письма пачками через одно соединение.
+
+        Возвращает:
+            int: Сколько писем отправлено"""
+
+    batch_size = batch_size or settings.ABSENTEE_DIGEST_BATCH
+    sent = 0
+    with get_connection() as connection:
+        for offset in range(0, len(messages), batch_size):
+            sent += connection.send_messages(messages[offset:offset + batch_size]) or 0
+    return sent
@@ -0,0 +1,159 @@
+"""Рассылка изменений посещаемости подписчикам потока Server-Sent Events.
+
+Подписчик (AttendanceEventsView) получает asyncio.Queue для одного занятия, а код,
+изменяющий записи, вызывает publish_changes после фиксации транзакции.
+
+Бэкенды (настройка ATTENDANCE_EVENTS_BACKEND):
+    local    - рассылка внутри процесса. Подходит, когда изменения и поток событий
+               обслуживает один процесс (например, uvicorn в разработке).
+    postgres - изменения отправляются через NOTIFY, а в каждом процессе с подписчиками
+               фоновый поток слушает канал (LISTEN) и раздает сообщения локально. Так
+               изменения из воркеров gunicorn доходят до отдельного ASGI-сервиса."""
+
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'attendance_events'
+# Ограничение PostgreSQL на размер payload NOTIFY - 8000 байт
+MAX_PAYLOAD = 7500
+
+
+def record_change(student_id, status, notes=''):
+    return {'student': student_id, 'status': status, 'notes': notes}
+
+
+class LocalBroker:
+    """Подписки на занятия в пределах процесса"""
+
+    queue_size = 100
+
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, repetition_id):
+        """Очередь сообщений занятия для текущего event loop"""
+
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[repetition_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, repetition_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(repetition_id, set())
+            subscribers.difference_update({item for item in subscribers if item[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(repetition_id, None)
+
+    def deliver(self, repetition_id, message):
+        """Передает сообщение всем подписчикам занятия (из любого потока)"""
+
+        with self._lock:
+            subscribers = list(self._subscribers.get(repetition_id, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._put, queue, message)
+
+    @staticmethod
+    def _put(queue, message):
+        # Медленный клиент теряет сообщения, а не копит их в памяти;
+        # при переподключении страница все равно перечитывает состояние
+        if not queue.full():
+            queue.put_nowait(message)
+
+    def publish(self, repetition_id, changes):
+        self.deliver(repetition_id, json.dumps({'changes': changes}, ensure_ascii=False))
+
+
+class PostgresBroker(LocalBroker):
+    """Рассылка между процессами через LISTEN/NOTIFY PostgreSQL"""
+
+    reconnect_delay = 5
+
+    def __init__(self, using='default'):
+        super().__init__()
+        self.using = using
+        self._listener = None
+
+    def publish(self, repetition_id, changes):
+        with connections[self.using].cursor() as cursor:
+            for payload in self._payloads(repetition_id, changes):
+                cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+
+    @staticmethod
+    def _payloads(repetition_id, changes):
+        """Делит изменения на сообщения, помещающиеся в payload NOTIFY"""
+
+        batch = []
+        for change in changes:
+            candidate = json.dumps({'repetition': repetition_id, 'changes': batch + [change]}, ensure_ascii=False)
+            if batch and len(candidate.encode()) > MAX_PAYLOAD:
+                yield json.dumps({'repetition': repetition_id, 'changes': batch}, ensure_ascii=False)
+                batch = []
+            batch.append(change)
+        if batch:
+            yield json.dumps({'repetition': repetition_id, 'changes': batch}, ensure_ascii=False)
+
+    def subscribe(self, repetition_id):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='attendance-listen', daemon=True)
+                self._listener.start()
+        return super().subscribe(repetition_id)
+
+    def _listen(self):
+        wrapper = connections[self.using]
+        while True:
+            try:
+                connection = wrapper.get_new_connection(wrapper.get_connection_params())
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f'LISTEN {CHANNEL}')
+                while True:
+                    if select.select([connection], [], [], 60) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        notify = connection.notifies.pop(0)
+                        message = json.loads(notify.payload)
+                        self.deliver(message['repetition'], json.dumps({'changes': message['changes']}))
+            except Exception:
+                logger.exception('Соединение LISTEN %s потеряно, переподключение', CHANNEL)
+                time.sleep(self.reconnect_delay)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = PostgresBroker() if settings.ATTENDANCE_EVENTS_BACKEND == 'postgres' else LocalBroker()
+    return _broker
+
+
+def publish_changes(repetition_id, changes):
+    """Отправляет изменения записей занятия подписчикам после фиксации транзакции"""
+
+    if not changes:
+        return
+
+    def send():
+        try:
+            get_broker().publish(repetition_id, changes)
+        except Exception:
+            logger.exception('Не удалось отправить изменения посещаемости занятия %s', repetition_id)
+
+    transaction.on_commit(send)
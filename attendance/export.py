@@ -0,0 +1,227 @@
+"""Инкрементальная выгрузка посещаемости в колоночные файлы для аналитики.
+
+Каждая строка - запись посещаемости с атрибутами занятия, группы и участника (без
+имен и контактов). Файлы разложены по каталогам учебного года и месяца:
+
+    <каталог>/academic_year=2025/month=2025-09/part-20261019T030000-0001.parquet
+
+Формат - Parquet, если установлен pyarrow, иначе сжатые массивы NumPy (.npz, по
+массиву на колонку). Оба формата читает read_export().
+
+Каждый запуск дописывает новые файлы только со строками, измененными после
+предыдущего запуска: записями с updated_at в интервале (метка, граница], а также
+записями занятий и участников, изменившихся в этом интервале (их атрибуты в строке
+устарели). Метка хранится в _state.json рядом с файлами и сдвигается только после
+записи всех файлов. Граница отстает от текущего времени на EXPORT_LAG, чтобы не
+пропустить транзакции, еще не зафиксированные в момент чтения, и отставание реплики.
+
+Измененная запись попадает в выгрузку повторно (возможно, в другой месяц, если занятие
+перенесли), поэтому читать файлы нужно по порядку запусков, оставляя последнюю
+версию каждого id, - так делает read_export(). Удаленные записи (в том числе
+перенесенные в архив) из выгрузки не исчезают. Полная выгрузка (full=True)
+пересобирает каталог без повторов."""
+
+import json
+import os
+import shutil
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.db.models import Q
+from django.utils import timezone
+
+from attendance.models import AttendanceRecord, Repetition
+from attendance.utils import current_academic_year
+from students.models import Student
+
+try:
+    import pyarrow
+except ImportError:  # pyarrow необязателен: без него выгрузка пишется в .npz
+    pyarrow = None
+
+STATE_FILE = '_state.json'
+EXPORT_LAG = timedelta(minutes=10)
+PART_ROWS = 200_000
+
+# Колонка выгрузки: (имя, поле для values_list, тип NumPy)
+COLUMNS = [
+    ('id', 'id', 'int64'),
+    ('repetition_id', 'repetition_id', 'int64'),
+    ('repetition_date', 'repetition_date', 'datetime64[D]'),
+    ('start_minutes', 'repetition__start_time', 'int16'),
+    ('duration', 'repetition__duration', 'int16'),
+    ('hall', 'repetition__hall', 'str'),
+    ('group_id', 'repetition__group_id', 'int64'),
+    ('group_age_category', 'repetition__group__age_category', 'str'),
+    ('group_year', 'repetition__group__year', 'int16'),
+    ('group_gender', 'repetition__group__gender', 'str'),
+    ('student_id', 'student_id', 'int64'),
+    ('student_gender', 'student__gender', 'str'),
+    ('student_status', 'student__status', 'str'),
+    ('student_birth_date', 'student__birth_date', 'datetime64[D]'),
+    ('status', 'status', 'str'),
+    ('present', 'present', 'bool'),
+    ('updated_at', 'updated_at', 'datetime64[us]'),
+]
+
+
+def default_format():
+    return 'parquet' if pyarrow is not None else 'npz'
+
+
+def load_state(root):
+    path = Path(root) / STATE_FILE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def save_state(root, state):
+    path = Path(root) / STATE_FILE
+    tmp = path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, path)
+
+
+def changed_records(since, until):
+    """Записи для выгрузки: измененные в интервале (since, until] или все (since=None)"""
+
+    changed = Q(updated_at__lte=until)
+    if since is not None:
+        changed &= Q(updated_at__gt=since)
+        # Записи занятий и участников, изменившихся в интервале, выгружаются с новыми атрибутами
+        changed |= Q(repetition__in=Repetition.objects.filter(updated_at__gt=since, updated_at__lte=until))
+        changed |= Q(student__in=Student.objects.filter(updated_at__gt=since, updated_at__lte=until))
+    return AttendanceRecord.objects.filter(changed)
+
+
+def partition_path(day):
+    return f'academic_year={current_academic_year(day)}/month={day:%Y-%m}'
+
+
+def to_column(values, dtype):
+    if dtype == 'str':
+        return np.array(values, dtype=str)
+    if dtype == 'datetime64[us]':
+        values = [value.astimezone(dt_timezone.utc).replace(tzinfo=None) for value in values]
+    return np.array(values, dtype=dtype)
+
+
+def build_columns(rows, academic_year):
+    """Колонки (dict имя -> массив) из строк values_list"""
+
+    values = list(zip(*rows))
+    columns = {}
+    for index, (name, _, dtype) in enumerate(COLUMNS):
+        column = values[index]
+        if name == 'start_minutes':
+            column = [value.hour * 60 + value.minute for value in column]
+        columns[name] = to_column(column, dtype)
+    columns['academic_year'] = np.full(len(rows), academic_year, dtype='int16')
+    return columns
+
+
+def write_part(directory, name, columns, file_format):
+    """Записывает файл через временное имя: читатели не видят недописанных файлов"""
+
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{name}.{file_format}'
+    tmp = directory / f'.{name}.tmp'
+    if file_format == 'parquet':
+        pd.DataFrame(columns).to_parquet(tmp, index=False)
+    else:
+        with open(tmp, 'wb') as file:
+            np.savez_compressed(file, **columns)
+    os.replace(tmp, path)
+    return path
+
+
+def export_records(root, full=False, file_format=None, now=None):
+    """Дописывает в каталог root записи, измененные после предыдущего запуска.
+
+    Записи читаются одним запросом в порядке (repetition_date, id), поэтому в памяти
+    одновременно держится не больше одного месяца (и не больше PART_ROWS строк).
+
+        Аргументы:
+            root (str): Каталог выгрузки
+            full (bool): Пересобрать выгрузку целиком (каталог заменяется по готовности)
+            file_format (str, optional): 'parquet' или 'npz' (по умолчанию - по наличию pyarrow)
+            now (datetime, optional): Текущее время (для проверки)
+
+        Возвращает:
+            tuple: (число выгруженных строк, число записанных файлов)
+
+        Исключения:
+            ValueError: Если для Parquet не установлен pyarrow"""
+
+    file_format = file_format or default_format()
+    if file_format == 'parquet' and pyarrow is None:
+        raise ValueError('Для выгрузки в Parquet установите pyarrow')
+
+    root = Path(root)
+    state = None if full else load_state(root)
+    since = datetime.fromisoformat(state['watermark']) if state else None
+    until = (now or timezone.now()) - EXPORT_LAG
+    if since is not None and since >= until:
+        return 0, 0
+
+    target = root.with_name(root.name + '.new') if full else root
+    if full:
+        shutil.rmtree(target, ignore_errors=True)
+    target.mkdir(parents=True, exist_ok=True)
+
+    run = until.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%S')
+    records = changed_records(since, until).order_by('repetition_date', 'id').values_list(
+        *[path for _, path, _ in COLUMNS]
+    )
+    exported = parts = 0
+    month, buffer = None, []
+
+    def flush():
+        nonlocal parts
+        parts += 1
+        write_part(target / partition_path(month), f'part-{run}-{parts:04d}',
+                   build_columns(buffer, current_academic_year(month)), file_format)
+        buffer.clear()
+
+    for row in records.iterator(chunk_size=5000):
+        row_month = row[2].replace(day=1)
+        if buffer and (row_month != month or len(buffer) >= PART_ROWS):
+            flush()
+        month = row_month
+        buffer.append(row)
+        exported += 1
+    if buffer:
+        flush()
+
+    save_state(target, {'watermark': until.isoformat(), 'format': file_format})
+    if full:
+        previous = root.with_name(root.name + '.old')
+        shutil.rmtree(previous, ignore_errors=True)
+        if root.exists():
+            root.rename(previous)
+        target.rename(root)
+        shutil.rmtree(previous, ignore_errors=True)
+    return exported, parts
+
+
+def read_export(root):
+    """Выгрузка целиком в DataFrame с последней версией каждой записи"""
+
+    paths = sorted(
+        (path for pattern in ('*.parquet', '*.npz') for path in Path(root).glob(f'academic_year=*/month=*/{pattern}')),
+        key=lambda path: path.name,
+    )
+    frames = []
+    for path in paths:
+        if path.suffix == '.parquet':
+            frames.append(pd.read_parquet(path))
+        else:
+            with np.load(path) as data:
+                frames.append(pd.DataFrame({name: data[name] for name in data.files}))
+    if not frames:
+        return pd.DataFrame(columns=[name for name, _, _ in COLUMNS] + ['academic_year'])
+    # Файлы упорядочены по запускам: последняя встреченная версия записи - самая свежая
+    return pd.concat(frames, ignore_index=True).drop_duplicates('id', keep='last').reset_index(drop=True)
@@ -1,9 +1,21 @@
 from django import forms
 
 from students.models import Group
+from .constants import PRESENT_STATUSES
 from .models import AttendanceRecord, Repetition
 
 
+def reconcile_present(cleaned_data):
+    """Приводит статус в соответствие с чекбоксом быстрой отметки present"""
+
+    status = cleaned_data.get('status')
+    if cleaned_data.get('present') and status == 'absent':
+        cleaned_data['status'] = 'present'
+    elif not cleaned_data.get('present') and status in PRESENT_STATUSES:
+        cleaned_data['status'] = 'absent'
+    return cleaned_data
+
+
 class AttendanceRecordForm(forms.ModelForm):
     """Форма для отметки посещаемости студентов (AttendanceRecord).
     Используется для создания и редактирования записей о посещаемости студентов на занятиях.
@@ -15,7 +27,6 @@ class AttendanceRecordForm(forms.ModelForm):
         Meta:
             - model (Model): Модель AttendanceRecord, на основе которой строится форма.
             - fields (list): Список включаемых полей формы:
-                - present (bool): Отметка о присутствии (чекбокс)
                 - status (str): Статус посещения (выпадающий список)
                 - notes (str): Дополнительные заметки (текстовое поле)
             - widgets (dict): Кастомизированные виджеты для полей формы:
@@ -26,24 +37,37 @@ class AttendanceRecordForm(forms.ModelForm):
                 - notes: Однострочное текстовое поле (TextInput) для заметок
         Note:
             Скрытые поля (student и repetition) обычно заполняются автоматически
-            при создании формы в представлении и не отображаются пользователю"""
+            при создании формы в представлении и не отображаются пользователю.
+            Поле модели present вычисляется базой данных из статуса, а одноименный
+            чекбокс формы - только быстрый способ выставить статус: отмеченный чекбокс
+            превращает «Отсутствовал» в «Присутствовал», снятый - «Присутствовал» или
+            «Опоздал» в «Отсутствовал»"""
+
+    present = forms.BooleanField(label='Присутствовал', required=False, widget=forms.CheckboxInput())
 
     class Meta:
         model = AttendanceRecord
-        fields = ['present', 'status', 'notes']
+        fields = ['status', 'notes']
         widgets = {
             'student': forms.HiddenInput(),
             'repetition': forms.HiddenInput(),
-            'present': forms.CheckboxInput(),
             'status': forms.Select(),
             'notes': forms.TextInput()
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['present'].initial = self.instance.status in PRESENT_STATUSES
+
+    def clean(self):
+        cleaned_data = super().clean()
+        return reconcile_present(cleaned_data)
+
 
 class RepetitionForm(forms.ModelForm):
     class Meta:
         model = Repetition
-        fields = ['date', 'start_time', 'duration', 'notes']  # убрали group из полей
+        fields = ['date', 'start_time', 'duration', 'hall', 'notes']  # убрали group из полей
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'start_time': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
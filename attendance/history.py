@@ -0,0 +1,129 @@
+"""История посещаемости участника с постраничной выдачей по ключу.
+
+Записи идут от новых к старым в порядке (repetition_date, id) - том же, что у индекса
+attendance_student_hist_idx. Следующая страница запрашивается курсором с ключом
+последней показанной записи, а не номером страницы: база сразу находит место в
+индексе, и сотая страница стоит столько же, сколько первая (OFFSET пришлось бы
+пропускать все предыдущие строки).
+
+Курсор также несет накопленные итоги (сколько записей и присутствий было до
+следующей записи включительно), поэтому нарастающий процент посещаемости каждой
+строки считается без повторной агрегации всей истории. Сводка (процент, текущая и
+лучшая серии присутствий) считается один раз - для первой страницы."""
+
+from datetime import date
+
+from django.core.exceptions import BadRequest
+
+from attendance.constants import PRESENT_STATUSES, STATUS_CHOICES
+from attendance.models import AttendanceRecord
+from students.models import Group
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(day, record_id, total, present):
+    return f'{day.isoformat()}.{record_id}.{total}.{present}'
+
+
+def decode_cursor(value):
+    """Разбирает курсор вида 'дата.id.записей.присутствий'.
+
+        Исключения:
+            BadRequest: Если курсор поврежден"""
+
+    try:
+        day, record_id, total, present = value.split('.')
+        return date.fromisoformat(day), int(record_id), int(total), int(present)
+    except ValueError:
+        raise BadRequest('Некорректный курсор')
+
+
+def history_summary(student_id):
+    """Сводка по всей истории участника одним проходом по статусам.
+
+    Статусы читаются из покрывающего индекса (в PostgreSQL - без обращения к таблице).
+
+        Возвращает:
+            dict: total, present, rate (%), current_streak, longest_streak"""
+
+    total = present = current_streak = longest_streak = run = 0
+    in_current = True
+    statuses = AttendanceRecord.objects.filter(student_id=student_id).order_by(
+        '-repetition_date', '-id'
+    ).values_list('status', flat=True)
+    for status in statuses.iterator(chunk_size=2000):
+        total += 1
+        if status in PRESENT_STATUSES:
+            present += 1
+            run += 1
+            longest_streak = max(longest_streak, run)
+            if in_current:
+                current_streak += 1
+        else:
+            run = 0
+            in_current = False
+    return {
+        'total': total,
+        'present': present,
+        'rate': round(present / total * 100, 1) if total else 0,
+        'current_streak': current_streak,
+        'longest_streak': longest_streak,
+    }
+
+
+def history_page(student_id, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """Страница истории участника.
+
+        Аргументы:
+            student_id (int): id участника
+            cursor (str, optional): Курсор из предыдущей страницы (None - первая страница)
+            limit (int): Размер страницы
+
+        Возвращает:
+            tuple: (строки, курсор следующей страницы или None, сводка или None)
+
+        Исключения:
+            BadRequest: Если курсор поврежден"""
+
+    records = AttendanceRecord.objects.filter(student_id=student_id)
+    summary = None
+    if cursor:
+        last_date, last_id, total, present = decode_cursor(cursor)
+        # Условие на repetition_date - диапазон индекса, исключение добирает записи того же дня
+        records = records.filter(repetition_date__lte=last_date).exclude(
+            repetition_date=last_date, id__gte=last_id
+        )
+    else:
+        summary = history_summary(student_id)
+        total, present = summary['total'], summary['present']
+
+    page = list(records.order_by('-repetition_date', '-id').values_list(
+        'id', 'repetition_date', 'repetition_id', 'repetition__start_time', 'repetition__group_id', 'status', 'notes'
+    )[:limit + 1])
+    has_next = len(page) > limit
+    page = page[:limit]
+
+    groups = {group.pk: str(group) for group in Group.objects.filter(pk__in={row[4] for row in page})}
+    statuses = dict(STATUS_CHOICES)
+    rows = []
+    for record_id, day, repetition_id, start_time, group_id, status, notes in page:
+        # Нарастающий процент на дату занятия: учитываются эта запись и все более ранние
+        rows.append({
+            'id': record_id,
+            'date': day,
+            'start_time': start_time,
+            'repetition_id': repetition_id,
+            'group': groups.get(group_id, ''),
+            'status': status,
+            'status_display': statuses.get(status, status),
+            'present': status in PRESENT_STATUSES,
+            'notes': notes,
+            'running_rate': round(present / total * 100, 1) if total else 0,
+        })
+        total -= 1
+        present -= status in PRESENT_STATUSES
+
+    next_cursor = encode_cursor(page[-1][1], page[-1][0], total, present) if has_next else None
+    return rows, next_cursor, summary
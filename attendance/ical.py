@@ -0,0 +1,132 @@
+"""Расписание репетиций в формате iCalendar (RFC 5545).
+
+Лента строится потоково: события формируются по одному из итератора по занятиям, и
+ответ не собирается в памяти целиком. Готовое тело ленты одновременно копится для
+кеша, ключ которого содержит версию расписания (ETag), поэтому устаревшая копия
+никогда не отдается, а неизменившаяся лента повторно не рендерится.
+
+Версия расписания - время последнего изменения занятий и их число (удаление занятия
+не меняет max(updated_at), но уменьшает число) и отпечаток названий, попадающих в
+текст ленты: названия календаря и групп. Переименование группы или педагога меняет
+ETag, хотя занятия не изменились. Календарные клиенты опрашивают ленту часто, и при
+совпадении ETag ответ 304 стоит одного агрегирующего запроса."""
+
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils import timezone
+
+CRLF = '\r\n'
+CACHE_PREFIX = 'attendance:ical'
+
+
+def escape_text(value):
+    """Экранирование значения TEXT (запятые, точки с запятой, переводы строк)"""
+
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Перенос строк длиннее 75 октетов (продолжение начинается с пробела)"""
+
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + CRLF
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Не разрываем многобайтовый символ UTF-8
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start, limit = end, 74
+    return (CRLF + ' ').join(parts) + CRLF
+
+
+def format_utc(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def feed_window_start():
+    """Первая дата, попадающая в ленту (прошедшие занятия старше окна не отдаются)"""
+
+    return timezone.localdate() - timedelta(days=settings.ICAL_PAST_DAYS)
+
+
+def feed_version(repetitions, labels):
+    """Версия ленты: (Last-Modified, ETag) по одному агрегирующему запросу.
+
+        Аргументы:
+            repetitions (QuerySet): Занятия ленты
+            labels (list): Названия, которые попадают в текст ленты (календарь, группы)
+
+        Возвращает:
+            tuple: (datetime или None, строка ETag без кавычек)"""
+
+    stats = repetitions.aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+    last_modified = stats['last_modified']
+    stamp = int(last_modified.timestamp()) if last_modified else 0
+    names = hashlib.sha1('\n'.join(labels).encode()).hexdigest()[:12]
+    return last_modified, f'{stamp}-{stats["count"]}-{feed_window_start():%Y%m%d}-{names}'
+
+
+def iter_events(repetitions, domain):
+    """События ленты; domain делает UID уникальным вне нашего сайта"""
+
+    for repetition in repetitions.iterator(chunk_size=500):
+        start = timezone.make_aware(datetime.combine(repetition.date, repetition.start_time))
+        lines = [
+            'BEGIN:VEVENT',
+            f'UID:repetition-{repetition.pk}@{domain}',
+            f'DTSTAMP:{format_utc(repetition.updated_at)}',
+            f'LAST-MODIFIED:{format_utc(repetition.updated_at)}',
+            f'DTSTART:{format_utc(start)}',
+            f'DTEND:{format_utc(start + timedelta(minutes=repetition.duration))}',
+            f'SUMMARY:{escape_text(f"Репетиция: {repetition.group}")}',
+        ]
+        if repetition.notes:
+            lines.append(f'DESCRIPTION:{escape_text(repetition.notes)}')
+        lines.append('END:VEVENT')
+        yield ''.join(fold(line) for line in lines)
+
+
+def iter_calendar(name, repetitions, domain):
+    """Лента iCalendar кусками по одному событию.
+
+        Аргументы:
+            name (str): Название календаря для клиента
+            repetitions (QuerySet): Занятия ленты
+            domain (str): Домен для UID событий"""
+
+    yield ''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Kovylek//Rehearsals//RU',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(name)}',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT1H',
+    ))
+    yield from iter_events(repetitions, domain)
+    yield 'END:VCALENDAR' + CRLF
+
+
+def cache_key(kind, pk, etag):
+    return f'{CACHE_PREFIX}:{kind}:{pk}:{etag}'
+
+
+def caching_stream(key, chunks):
+    """Отдает куски ленты и, если лента выдана полностью, кладет ее в кеш"""
+
+    body = []
+    for chunk in chunks:
+        encoded = chunk.encode()
+        body.append(encoded)
+        yield encoded
+    cache.set(key, b''.join(body), settings.ICAL_CACHE_TIMEOUT)
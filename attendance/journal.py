@@ -0,0 +1,83 @@
+"""Журнал изменений посещаемости (модель AttendanceChange).
+
+Изменения накапливаются в памяти внутри journal_batch() и записываются одним
+bulk_create при выходе из блока, поэтому сохранение формы на всю группу добавляет
+один INSERT, а не по одному на запись. Блок ставится внутри transaction.atomic():
+журнал пишется в той же транзакции, что и отметки, и откатывается вместе с ними.
+При выходе из блока по исключению накопленные изменения отбрасываются.
+
+Вне journal_batch() каждое изменение записывается сразу (например, save() из shell).
+
+Изменения через save() журналирует сигнал post_save (attendance/signals.py), а
+bulk_create/bulk_update/update() - вызывающий код через log_change."""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.utils import timezone
+
+from attendance.constants import CHANGE_SOURCE_SYSTEM, STATUS_CODES
+from attendance.models import AttendanceChange
+
+_batch = ContextVar('attendance_journal_batch', default=None)
+
+
+class JournalBatch:
+    def __init__(self, user_id, source):
+        self.user_id = user_id
+        self.source = source
+        self.changes = []
+
+    def flush(self):
+        if self.changes:
+            AttendanceChange.objects.bulk_create(self.changes)
+            self.changes = []
+
+
+@contextmanager
+def journal_batch(user=None, source=CHANGE_SOURCE_SYSTEM):
+    """Накапливает изменения посещаемости и записывает их одним INSERT.
+
+    Вложенный блок присоединяется к внешнему: пользователь и источник берутся
+    из внешнего блока, а запись происходит при выходе из него.
+
+        Аргументы:
+            user (User, optional): Кто вносит изменения (анонимный пользователь не сохраняется)
+            source (int): Источник изменения из CHANGE_SOURCE_CHOICES"""
+
+    if _batch.get() is not None:
+        yield _batch.get()
+        return
+
+    user_id = user.pk if user is not None and user.is_authenticated else None
+    batch = JournalBatch(user_id, source)
+    token = _batch.set(batch)
+    try:
+        yield batch
+    finally:
+        _batch.reset(token)
+    batch.flush()
+
+
+def log_change(record_id, repetition_id, student_id, old_status, new_status, changed_at=None):
+    """Добавляет изменение статуса в журнал (old_status=None - запись создана).
+
+    Если статус не изменился, ничего не делает."""
+
+    if old_status == new_status:
+        return
+    batch = _batch.get()
+    change = AttendanceChange(
+        record_id=record_id,
+        repetition_id=repetition_id,
+        student_id=student_id,
+        old_status=STATUS_CODES.get(old_status),
+        new_status=STATUS_CODES[new_status],
+        user_id=batch.user_id if batch else None,
+        source=batch.source if batch else CHANGE_SOURCE_SYSTEM,
+        changed_at=changed_at or timezone.now(),
+    )
+    if batch is None:
+        change.save()
+    else:
+        batch.changes.append(change)
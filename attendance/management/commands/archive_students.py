@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from attendance.archive import archive_students, students_to_archive, sync_student_statuses
+
+
+class Command(BaseCommand):
+    """Архивация посещаемости выбывших участников.
+
+    Сначала статусы участников приводятся в соответствие с датой отчисления и годом
+    выпуска, затем история выпускников и отчисленных переносится в AttendanceArchive."""
+
+    help = 'Переносит историю посещаемости выпускников и отчисленных в архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, кого затронет архивация')
+        parser.add_argument('--skip-status-sync', action='store_true',
+                            help='Не обновлять статусы по дате отчисления и году выпуска')
+        parser.add_argument('--batch-size', type=int, default=200, help='Участников в одной транзакции')
+
+    def handle(self, *args, **options):
+        if not options['skip_status_sync'] and not options['dry_run']:
+            expelled, graduated = sync_student_statuses()
+            self.stdout.write(f'Статусы обновлены: отчислено {expelled}, выпускников {graduated}')
+
+        student_ids = students_to_archive().values_list('pk', flat=True)
+        if options['dry_run']:
+            self.stdout.write(f'К архивации: {student_ids.count()} участников')
+            return
+
+        moved = archive_students(list(student_ids), batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'В архив перенесено записей: {moved}'))
@@ -0,0 +1,69 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from attendance.models import AttendanceRecord
+from attendance.partitions import (DEFAULT_PARTITION, academic_year_start, convert_to_partitioned, create_partition,
+                                   detach_partition, is_partitioned, list_partitions)
+
+
+class Command(BaseCommand):
+    """Обслуживание секций таблицы посещаемости.
+
+    Запускать по расписанию (например, ежемесячно через cron) - тогда секция следующего
+    учебного года появляется заранее, до 1 июня:
+        python manage.py attendance_partitions --ahead 1"""
+
+    help = 'Создает секции посещаемости на текущий и следующие учебные годы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=1,
+                            help='Сколько учебных лет вперед подготовить (по умолчанию 1)')
+        parser.add_argument('--convert', action='store_true',
+                            help='Перестроить обычную таблицу в секционированную')
+        parser.add_argument('--detach', type=int, metavar='YEAR',
+                            help='Отсоединить секцию учебного года, начинающегося в YEAR, для архивации')
+        parser.add_argument('--list', action='store_true', help='Показать существующие секции')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Секционирование поддерживается только в PostgreSQL')
+
+        if options['convert']:
+            if is_partitioned(connection):
+                self.stdout.write('Таблица уже секционирована')
+            else:
+                with connection.schema_editor() as schema_editor:
+                    convert_to_partitioned(schema_editor, AttendanceRecord)
+                self.stdout.write(self.style.SUCCESS('Таблица посещаемости секционирована по учебным годам'))
+
+        if not is_partitioned(connection):
+            raise CommandError('Таблица посещаемости не секционирована: включите ATTENDANCE_PARTITIONING '
+                               'и выполните migrate или запустите команду с --convert')
+
+        if options['detach'] is not None:
+            with transaction.atomic():
+                detach_partition(connection, options['detach'])
+            self.stdout.write(self.style.SUCCESS(f'Секция {options["detach"]}/{options["detach"] + 1} отсоединена'))
+            return
+
+        current_year = academic_year_start(date.today())
+        years = set(range(current_year, current_year + options['ahead'] + 1))
+        # Записи, попавшие в DEFAULT (например, занятия, внесенные задним числом), получают свои секции
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT DISTINCT EXTRACT(YEAR FROM repetition_date - INTERVAL '5 months')::int "
+                f"FROM {connection.ops.quote_name(DEFAULT_PARTITION)}"
+            )
+            years.update(row[0] for row in cursor.fetchall())
+
+        for start_year in sorted(years):
+            with transaction.atomic():
+                created = create_partition(connection, start_year)
+            if created:
+                self.stdout.write(self.style.SUCCESS(f'Создана секция {start_year}/{start_year + 1}'))
+
+        if options['list']:
+            for name, bounds in list_partitions(connection):
+                self.stdout.write(f'{name}: {bounds}')
@@ -0,0 +1,64 @@
+import statistics
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+
+from attendance.calendar_data import STATUS_TOKENS, build_columns, build_rows
+from students.constants import GENDER_FEMALE, GENDER_MALE
+
+
+class Command(BaseCommand):
+    """Замер времени рендеринга сетки календаря посещаемости.
+
+    Данные синтетические и строятся в памяти, база не используется, поэтому
+    измеряется только подготовка матрицы и работа шаблона:
+        python manage.py benchmark_calendar --students 60 --days 31"""
+
+    help = 'Измеряет время рендеринга сетки календаря посещаемости'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=60, help='Число участников (строк)')
+        parser.add_argument('--days', type=int, default=31, help='Число занятий (колонок)')
+        parser.add_argument('--iterations', type=int, default=50, help='Число повторов')
+
+    def handle(self, *args, **options):
+        today = date.today()
+        first_day = today.replace(day=1)
+        dates = [first_day + timedelta(days=offset % 31) for offset in range(options['days'])]
+        repetition_ids = list(range(1, options['days'] + 1))
+        students = [
+            (student_id, f'Фамилия{student_id} Имя{student_id}', GENDER_FEMALE if student_id % 2 else GENDER_MALE)
+            for student_id in range(1, options['students'] + 1)
+        ]
+        status_names = list(STATUS_TOKENS) + [None]
+        statuses = {
+            (student_id, repetition_id): status_names[(student_id + repetition_id) % len(status_names)]
+            for student_id, _, _ in students
+            for repetition_id in repetition_ids
+        }
+
+        template = get_template('attendance/includes/calendar_grid.html')
+        build_times, render_times = [], []
+        size = 0
+        for _ in range(options['iterations']):
+            started = time.perf_counter()
+            columns = build_columns(dates, today)
+            calendar = {
+                'columns': columns,
+                'rows': build_rows(students, repetition_ids, [column['css'] for column in columns], statuses),
+            }
+            built = time.perf_counter()
+            size = len(template.render({'calendar': calendar}))
+            build_times.append((built - started) * 1000)
+            render_times.append((time.perf_counter() - built) * 1000)
+
+        self.stdout.write(
+            f'Сетка {options["students"]} x {options["days"]}, повторов: {options["iterations"]}, HTML: {size} байт'
+        )
+        for title, times in (('Подготовка матрицы', build_times), ('Рендеринг шаблона', render_times)):
+            self.stdout.write(
+                f'{title}: медиана {statistics.median(times):.2f} мс, минимум {min(times):.2f} мс, '
+                f'максимум {max(times):.2f} мс'
+            )
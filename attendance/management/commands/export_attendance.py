@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.export import export_records
+from config.db_router import use_reporting
+
+
+class Command(BaseCommand):
+    """Инкрементальная выгрузка посещаемости в Parquet (или .npz без pyarrow).
+
+    Запускать по расписанию, например каждую ночь через cron:
+        python manage.py export_attendance
+    Время работы пропорционально числу изменений с прошлого запуска; --full
+    пересобирает выгрузку без повторных версий записей."""
+
+    help = 'Дописывает измененные записи посещаемости в колоночные файлы для аналитики'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.ATTENDANCE_EXPORT_DIR, help='Каталог выгрузки')
+        parser.add_argument('--full', action='store_true', help='Пересобрать выгрузку целиком')
+        parser.add_argument('--format', choices=['parquet', 'npz'],
+                            help='Формат файлов (по умолчанию Parquet, если установлен pyarrow)')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            with use_reporting():
+                exported, parts = export_records(options['output'], full=options['full'],
+                                                 file_format=options['format'])
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено строк: {exported}, файлов: {parts} за {time.monotonic() - started:.1f} с'
+        ))
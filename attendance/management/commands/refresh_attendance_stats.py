@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from attendance.monthly_stats import create_stats_view, refresh_stats, stats_view_exists
+
+
+class Command(BaseCommand):
+    """Обновление помесячной статистики посещаемости (MonthlyAttendanceStat).
+
+    По расписанию команду запускает сервис stats из docker-compose.yml (каждые 15 минут);
+    без него нужен cron с тем же интервалом:
+        */15 * * * * python manage.py refresh_attendance_stats"""
+
+    help = 'Пересчитывает помесячную статистику посещаемости'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--blocking', action='store_true',
+                            help='Обновить без CONCURRENTLY: быстрее, но чтение статистики ждет окончания')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if not stats_view_exists(connection):
+            # Представление могло пропасть при пересоздании таблицы посещаемости вручную
+            create_stats_view(connection)
+        else:
+            refresh_stats(connection, concurrently=not options['blocking'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Статистика обновлена за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,50 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from attendance.digest import digest_messages, find_absentees, group_digests, send_in_batches
+from config.db_router import use_reporting
+
+
+class Command(BaseCommand):
+    """Еженедельная сводка пропусков для педагогов.
+
+    Запускать по расписанию, например по понедельникам через cron:
+        python manage.py send_absentee_digest"""
+
+    help = 'Рассылает педагогам списки участников, пропускающих репетиции'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ABSENTEE_DIGEST_DAYS,
+                            help='За сколько последних дней учитывать отметки')
+        parser.add_argument('--streak', type=int, default=settings.ABSENTEE_STREAK,
+                            help='Сколько пропусков подряд попадает в сводку')
+        parser.add_argument('--rate', type=int, default=settings.ABSENTEE_RATE,
+                            help='Посещаемость (%%), ниже которой участник попадает в сводку')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, кому уйдут письма')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        end = timezone.localdate()
+        start = end - timedelta(days=options['days'] - 1)
+        with use_reporting():
+            absentees = find_absentees(start, end, streak=options['streak'], rate=options['rate'])
+            digests, orphaned = group_digests(absentees)
+
+        for group in orphaned:
+            self.stdout.write(self.style.WARNING(f'{group}: у группы нет педагога с email, сводка не отправлена'))
+        if options['dry_run']:
+            for teacher, groups in digests:
+                count = sum(len(absentees) for _, absentees in groups)
+                self.stdout.write(f'{teacher.email}: групп {len(groups)}, участников {count}')
+            self.stdout.write(f'Пропускающих участников: {len(absentees)}, писем: {len(digests)}')
+            return
+
+        sent = send_in_batches(digest_messages(digests, start, end))
+        self.stdout.write(self.style.SUCCESS(
+            f'Пропускающих участников: {len(absentees)}, отправлено писем: {sent} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
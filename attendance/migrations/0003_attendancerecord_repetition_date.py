@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+def fill_repetition_date(apps, schema_editor):
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    Repetition = apps.get_model('attendance', 'Repetition')
+    AttendanceRecord.objects.update(
+        repetition_date=models.Subquery(
+            Repetition.objects.filter(pk=models.OuterRef('repetition_id')).values('date')[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+    # Заполнение и ALTER ... SET NOT NULL в одной транзакции PostgreSQL не допускает
+    # (pending trigger events), поэтому операции выполняются по отдельности
+    atomic = False
+
+    dependencies = [
+        ('attendance', '0002_alter_attendancerecord_unique_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='repetition_date',
+            field=models.DateField(editable=False, null=True, verbose_name='Дата занятия'),
+        ),
+        migrations.RunPython(fill_repetition_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='attendancerecord',
+            name='repetition_date',
+            field=models.DateField(db_index=True, editable=False, help_text='Копия Repetition.date: по ней секционируется таблица и отсекаются учебные годы', verbose_name='Дата занятия'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:05
+
+from django.db import migrations
+
+from attendance.partitions import convert_to_partitioned, convert_to_plain, is_partitioned, partitioning_enabled
+
+
+def partition_table(apps, schema_editor):
+    """Секционирует таблицу по учебным годам, если ATTENDANCE_PARTITIONING включен (только PostgreSQL)"""
+    if partitioning_enabled(schema_editor.connection) and not is_partitioned(schema_editor.connection):
+        convert_to_partitioned(schema_editor, apps.get_model('attendance', 'AttendanceRecord'))
+
+
+def unpartition_table(apps, schema_editor):
+    if is_partitioned(schema_editor.connection):
+        convert_to_plain(schema_editor, apps.get_model('attendance', 'AttendanceRecord'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_attendancerecord_repetition_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_table, unpartition_table),
+    ]
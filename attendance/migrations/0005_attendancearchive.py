@@ -0,0 +1,35 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_partition_attendancerecord'),
+        ('students', '0004_student_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('records_count', models.PositiveIntegerField(default=0, verbose_name='Всего записей')),
+                ('present_count', models.PositiveIntegerField(default=0, verbose_name='Присутствовал')),
+                ('late_count', models.PositiveIntegerField(default=0, verbose_name='Опоздал')),
+                ('absent_count', models.PositiveIntegerField(default=0, verbose_name='Отсутствовал')),
+                ('excused_count', models.PositiveIntegerField(default=0, verbose_name='По уважительной причине')),
+                ('first_date', models.DateField(blank=True, null=True, verbose_name='Первое занятие')),
+                ('last_date', models.DateField(blank=True, null=True, verbose_name='Последнее занятие')),
+                ('payload', models.BinaryField(verbose_name='Записи (zlib + JSON)')),
+                ('archived_at', models.DateTimeField(auto_now=True, verbose_name='Дата архивации')),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_archive', to='students.student', verbose_name='Участник')),
+            ],
+            options={
+                'verbose_name': 'Архив посещаемости',
+                'verbose_name_plural': 'Архив посещаемости',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-19 12:00
+
+from django.db import migrations, models
+
+
+def reconcile_status(apps, schema_editor):
+    """Переносит расхождения present/status в статус по правилам прежнего AttendanceRecord.save()"""
+
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    AttendanceRecord.objects.filter(present=True, status='absent').update(status='present')
+    AttendanceRecord.objects.filter(present=False, status__in=['present', 'late']).update(status='absent')
+
+
+def restore_present(apps, schema_editor):
+    AttendanceRecord = apps.get_model('attendance', 'AttendanceRecord')
+    AttendanceRecord.objects.filter(status__in=['present', 'late']).update(present=True)
+
+
+class Migration(migrations.Migration):
+    # Как и в 0003: UPDATE и ALTER TABLE одной таблицы PostgreSQL не выполняет в общей транзакции
+    atomic = False
+
+    dependencies = [
+        ('attendance', '0005_attendancearchive'),
+    ]
+
+    operations = [
+        migrations.RunPython(reconcile_status, restore_present),
+        migrations.RemoveField(
+            model_name='attendancerecord',
+            name='present',
+        ),
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='present',
+            field=models.GeneratedField(db_persist=True, expression=models.Q(('status__in', ['present', 'late'])), help_text='Вычисляется базой данных из статуса', output_field=models.BooleanField(), verbose_name='Присутствовал'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_attendancerecord_present_generated'),
+        ('students', '0004_student_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['-repetition_date', '-id'], name='attendance_recent_idx'),
+        ),
+    ]
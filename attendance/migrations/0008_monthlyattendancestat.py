@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:10
+
+from django.db import migrations, models
+
+from attendance.monthly_stats import create_stats_view, drop_stats_view
+
+
+def create_view(apps, schema_editor):
+    create_stats_view(schema_editor.connection)
+
+
+def drop_view(apps, schema_editor):
+    drop_stats_view(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_attendancerecord_recent_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyAttendanceStat',
+            fields=[
+                ('pk', models.CompositePrimaryKey('month', 'group', 'student', blank=True, editable=False, primary_key=True, serialize=False)),
+                ('month', models.DateField(verbose_name='Месяц')),
+                ('present_count', models.PositiveIntegerField(verbose_name='Присутствовал')),
+                ('late_count', models.PositiveIntegerField(verbose_name='Опоздал')),
+                ('absent_count', models.PositiveIntegerField(verbose_name='Отсутствовал')),
+                ('excused_count', models.PositiveIntegerField(verbose_name='По уважительной причине')),
+                ('total_count', models.PositiveIntegerField(verbose_name='Всего отметок')),
+            ],
+            options={
+                'verbose_name': 'Статистика посещаемости за месяц',
+                'verbose_name_plural': 'Статистика посещаемости по месяцам',
+                'db_table': 'attendance_monthlyattendancestat',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_view, drop_view),
+    ]
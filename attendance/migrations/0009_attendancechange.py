@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:12
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_monthlyattendancestat'),
+        ('students', '0004_student_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_id', models.BigIntegerField(verbose_name='Запись посещаемости')),
+                ('old_status', models.PositiveSmallIntegerField(blank=True, help_text='Пусто - запись создана', null=True, verbose_name='Было')),
+                ('new_status', models.PositiveSmallIntegerField(verbose_name='Стало')),
+                ('source', models.PositiveSmallIntegerField(choices=[(1, 'Форма отметки'), (2, 'Быстрая отметка'), (3, 'Админка'), (4, 'Система')], default=4, verbose_name='Источник')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время изменения')),
+                ('repetition', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='attendance_changes', to='attendance.repetition', verbose_name='Занятие')),
+                ('student', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='attendance_changes', to='students.student', verbose_name='Участник')),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Изменение посещаемости',
+                'verbose_name_plural': 'Журнал изменений посещаемости',
+                'indexes': [models.Index(fields=['repetition', '-changed_at'], name='attendance_change_rep_idx'), models.Index(fields=['student', '-changed_at'], name='attendance_change_student_idx')],
+            },
+        ),
+    ]
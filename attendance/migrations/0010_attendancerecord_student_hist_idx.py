@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_attendancechange'),
+        ('students', '0004_student_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student', '-repetition_date', '-id'], include=('status',), name='attendance_student_hist_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:17
+
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+from attendance.scheduling import create_overlap_constraints, drop_overlap_constraints
+
+
+def add_constraints(apps, schema_editor):
+    """Ограничения на пересечение занятий (только PostgreSQL, см. attendance/scheduling.py)"""
+    create_overlap_constraints(schema_editor)
+
+
+def remove_constraints(apps, schema_editor):
+    drop_overlap_constraints(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0010_attendancerecord_student_hist_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repetition',
+            name='hall',
+            field=models.CharField(blank=True, help_text='Если указан, занятия разных групп в одном зале не могут пересекаться по времени', max_length=50, verbose_name='Зал'),
+        ),
+        # Расширение нужно для оператора = по group_id/hall в GiST; в других СУБД операция пропускается
+        BtreeGistExtension(),
+        migrations.RunPython(add_constraints, remove_constraints),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0011_repetition_no_overlap'),
+        ('students', '0006_group_last_rollover_year'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['updated_at'], name='attendance_updated_idx'),
+        ),
+    ]
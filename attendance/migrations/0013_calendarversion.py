@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0012_attendancerecord_updated_idx'),
+        ('students', '0006_group_last_rollover_year'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CalendarVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='Первое число месяца; 01.01.0001 - состав группы', verbose_name='Месяц')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Версия')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='students.group', verbose_name='Группа')),
+            ],
+            options={
+                'verbose_name': 'Версия календаря',
+                'verbose_name_plural': 'Версии календаря',
+                'unique_together': {('group', 'month')},
+            },
+        ),
+    ]
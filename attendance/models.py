@@ -1,8 +1,15 @@
-from django.db import models
+import json
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import models, router, transaction
+from django.db.models import Q
 from django.utils import timezone
-from datetime import timedelta
+from datetime import date, timedelta
 
-from attendance.constants import DURATION_CHOICES, STATUS_CHOICES
+from attendance.constants import (CHANGE_SOURCE_CHOICES, CHANGE_SOURCE_SYSTEM, DURATION_CHOICES, PRESENT_STATUSES,
+                                  STATUS_BY_CODE, STATUS_CHOICES)
 
 
 class Repetition(models.Model):
@@ -26,6 +33,12 @@ class Repetition(models.Model):
         on_delete=models.PROTECT,
         verbose_name='Группа'
     )
+    hall = models.CharField(
+        'Зал',
+        max_length=50,
+        blank=True,
+        help_text='Если указан, занятия разных групп в одном зале не могут пересекаться по времени'
+    )
     notes = models.TextField(
         'Примечания',
         blank=True,
@@ -53,6 +66,63 @@ class Repetition(models.Model):
     def __str__(self):
         return f"{self.date} {self.group}"
 
+    def clean(self):
+        """Запрещает пересечение по времени с занятиями той же группы или того же зала"""
+
+        from attendance.scheduling import describe_overlaps, find_overlaps
+
+        super().clean()
+        if self.group_id and self.date and self.start_time and self.duration:
+            overlaps = find_overlaps(self)
+            if overlaps:
+                raise ValidationError(describe_overlaps(self, overlaps))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Группа и дата на момент загрузки: перенос занятия меняет версию календаря прежнего месяца
+        instance._loaded_group_id = instance.__dict__.get('group_id')
+        instance._loaded_date = instance.__dict__.get('date')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Одна транзакция с версией календаря (сигнал post_save): новая версия не видна
+        # раньше, чем записи переедут на новую дату
+        with transaction.atomic(using=router.db_for_write(Repetition)):
+            super().save(*args, **kwargs)
+            # Дата занятия продублирована в записях посещаемости (ключ секционирования):
+            # при переносе занятия записи переезжают вместе с ним
+            self.attendance_records.exclude(repetition_date=self.date).update(
+                repetition_date=self.date, updated_at=timezone.now()
+            )
+
+    def create_missing_records(self):
+        """Создает записи «Отсутствовал» для активных участников группы без записи на занятие.
+
+        Все записи вставляются одним bulk_create; save() при этом не вызывается,
+        поэтому repetition_date заполняется здесь.
+
+            Возвращает:
+                list: Созданные записи посещаемости"""
+
+        from attendance.calendar_cache import touch_calendar
+        from attendance.events import publish_changes, record_change
+        from attendance.journal import journal_batch, log_change
+
+        existing = self.attendance_records.values('student_id')
+        student_ids = self.group.students.active().exclude(pk__in=existing).values_list('pk', flat=True)
+        records = AttendanceRecord.objects.bulk_create([
+            AttendanceRecord(repetition=self, student_id=student_id, status='absent', repetition_date=self.date)
+            for student_id in student_ids
+        ])
+        if records:
+            touch_calendar(self.group_id, self.date)
+            publish_changes(self.pk, [record_change(record.student_id, record.status) for record in records])
+            with journal_batch():
+                for record in records:
+                    log_change(record.pk, self.pk, record.student_id, None, record.status, record.created_at)
+        return records
+
 
 class AttendanceRecord(models.Model):
     """Модель записи о посещаемости"""
@@ -67,9 +137,12 @@ class AttendanceRecord(models.Model):
         on_delete=models.CASCADE,
         related_name='attendance_records'
     )
-    present = models.BooleanField(
-        'Присутствовал (быстрая отметка)',
-        default=False  # Изменили на False
+    present = models.GeneratedField(
+        expression=Q(status__in=PRESENT_STATUSES),
+        output_field=models.BooleanField(),
+        db_persist=True,
+        verbose_name='Присутствовал',
+        help_text='Вычисляется базой данных из статуса'
     )
     status = models.CharField(
         'Статус',
@@ -81,32 +154,265 @@ class AttendanceRecord(models.Model):
         'Комментарий',
         blank=True
     )
+    repetition_date = models.DateField(
+        'Дата занятия',
+        editable=False,
+        db_index=True,
+        help_text='Копия Repetition.date: по ней секционируется таблица и отсекаются учебные годы'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = 'Запись посещаемости'
         verbose_name_plural = 'Записи посещаемости'
+        indexes = [
+            # Сортировка списков «сначала свежие» и пагинация по (repetition_date, id)
+            models.Index(fields=['-repetition_date', '-id'], name='attendance_recent_idx'),
+            # История участника: постраничная выдача по ключу (repetition_date, id);
+            # статус в индексе позволяет считать сводку без чтения таблицы
+            models.Index(fields=['student', '-repetition_date', '-id'], include=['status'],
+                         name='attendance_student_hist_idx'),
+            # Инкрементальная выгрузка: записи, измененные после предыдущего запуска
+            models.Index(fields=['updated_at'], name='attendance_updated_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.student} - {'Присутствовал' if self.present else 'Отсутствовал'}"
+        return f"{self.student} - {self.get_status_display()}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Статус на момент загрузки: журнал изменений сравнивает с ним без лишнего SELECT
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_repetition_id = instance.__dict__.get('repetition_id')
+        return instance
 
     def save(self, *args, **kwargs):
-        # Улучшенная логика синхронизации
-        if self.present and self.status == 'absent':
-            self.status = 'present'
-        elif not self.present and self.status in ['present', 'late']:
-            self.status = 'absent'
+        # Дата копируется из занятия только у новой записи или при смене занятия: у
+        # загруженной записи она уже совпадает (Repetition.save переносит записи вместе
+        # с занятием), и сохранение формы на всю группу не загружает занятие для каждой строки
+        if self.repetition_date is None or self.repetition_id != getattr(self, '_loaded_repetition_id', None):
+            self.repetition_date = self.repetition.date
         super().save(*args, **kwargs)
+        self._loaded_repetition_id = self.repetition_id
 
     @property
     def status_display(self):
-        """Возвращает читаемый статус с учетом present"""
-        if self.status != 'present':
-            return self.get_status_display()
-        return 'Присутствовал' if self.present else 'Отсутствовал'
+        """Возвращает читаемый статус"""
+        return self.get_status_display()
 
     @property
     def is_completed(self):
         """Проверяет, была ли заполнена посещаемость"""
         return self.attendance_records.exists()
+
+
+class AttendanceArchive(models.Model):
+    """Сжатая история посещаемости выбывшего участника (выпускника или отчисленного).
+
+    Записи AttendanceRecord такого участника удаляются из основной таблицы, а в архиве
+    остаются счетчики по статусам (доступны для запросов) и полный список отметок
+    в виде zlib-сжатого JSON. Архив только для чтения."""
+
+    student = models.OneToOneField(
+        'students.Student',
+        on_delete=models.CASCADE,
+        related_name='attendance_archive',
+        verbose_name='Участник'
+    )
+    records_count = models.PositiveIntegerField('Всего записей', default=0)
+    present_count = models.PositiveIntegerField('Присутствовал', default=0)
+    late_count = models.PositiveIntegerField('Опоздал', default=0)
+    absent_count = models.PositiveIntegerField('Отсутствовал', default=0)
+    excused_count = models.PositiveIntegerField('По уважительной причине', default=0)
+    first_date = models.DateField('Первое занятие', null=True, blank=True)
+    last_date = models.DateField('Последнее занятие', null=True, blank=True)
+    payload = models.BinaryField('Записи (zlib + JSON)', editable=False)
+    archived_at = models.DateTimeField('Дата архивации', auto_now=True)
+
+    # Порядок значений в каждой записи payload
+    RECORD_FIELDS = ('date', 'start_time', 'group_id', 'status', 'notes')
+
+    class Meta:
+        verbose_name = 'Архив посещаемости'
+        verbose_name_plural = 'Архив посещаемости'
+
+    def __str__(self):
+        return f"Архив: {self.student}"
+
+    @staticmethod
+    def pack(rows):
+        """Сжимает список кортежей (date, start_time, group_id, status, notes)"""
+
+        return zlib.compress(json.dumps(rows, ensure_ascii=False, separators=(',', ':')).encode(), 9)
+
+    def unpack(self):
+        """Список записей архива в исходном виде (списки значений RECORD_FIELDS)"""
+
+        return json.loads(zlib.decompress(bytes(self.payload)))
+
+    @property
+    def records(self):
+        """Список записей архива в виде словарей, от ранних к поздним"""
+
+        return [dict(zip(self.RECORD_FIELDS, row)) for row in self.unpack()]
+
+
+class MonthlyAttendanceStatQuerySet(models.QuerySet):
+    def between(self, start_date, end_date):
+        """Месяцы, целиком или частично попадающие в период"""
+
+        return self.filter(month__gte=start_date.replace(day=1), month__lte=end_date)
+
+    def totals(self, *fields):
+        """Суммы счетчиков с группировкой по полям fields (например, 'group_id')"""
+
+        return self.values(*fields).annotate(
+            present=models.Sum('present_count'),
+            late=models.Sum('late_count'),
+            absent=models.Sum('absent_count'),
+            excused=models.Sum('excused_count'),
+            total=models.Sum('total_count'),
+        ).order_by(*fields)
+
+
+class MonthlyAttendanceStat(models.Model):
+    """Число отметок каждого статуса у участника в группе за месяц.
+
+    Модель только для чтения поверх материализованного представления (см.
+    attendance/monthly_stats.py); данные обновляет команда refresh_attendance_stats.
+    Группа - группа занятия, а не текущая группа участника."""
+
+    pk = models.CompositePrimaryKey('month', 'group', 'student')
+    month = models.DateField('Месяц')
+    group = models.ForeignKey(
+        'students.Group',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='+',
+        verbose_name='Группа'
+    )
+    student = models.ForeignKey(
+        'students.Student',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='monthly_attendance_stats',
+        verbose_name='Участник'
+    )
+    present_count = models.PositiveIntegerField('Присутствовал')
+    late_count = models.PositiveIntegerField('Опоздал')
+    absent_count = models.PositiveIntegerField('Отсутствовал')
+    excused_count = models.PositiveIntegerField('По уважительной причине')
+    total_count = models.PositiveIntegerField('Всего отметок')
+
+    objects = MonthlyAttendanceStatQuerySet.as_manager()
+
+    class Meta:
+        managed = False
+        db_table = 'attendance_monthlyattendancestat'
+        verbose_name = 'Статистика посещаемости за месяц'
+        verbose_name_plural = 'Статистика посещаемости по месяцам'
+
+    def __str__(self):
+        return f"{self.student} - {self.month:%m.%Y}"
+
+
+class AttendanceChangeQuerySet(models.QuerySet):
+    def for_repetition(self, repetition):
+        """История изменений отметок занятия, от новых к старым"""
+
+        return self.filter(repetition=repetition).select_related('student', 'user').order_by('-changed_at', '-id')
+
+    def for_student(self, student):
+        """История изменений отметок участника, от новых к старым"""
+
+        return self.filter(student=student).select_related('repetition', 'user').order_by('-changed_at', '-id')
+
+
+class AttendanceChange(models.Model):
+    """Запись журнала изменений посещаемости (только добавление).
+
+    Статусы хранятся кодами STATUS_CODES, связи - без внешних ключей в базе: журнал
+    переживает удаление и архивацию записей, занятий и участников и никогда не
+    обновляется. Пишется пачками через attendance.journal."""
+
+    record_id = models.BigIntegerField('Запись посещаемости')
+    repetition = models.ForeignKey(
+        Repetition,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='attendance_changes',
+        verbose_name='Занятие'
+    )
+    student = models.ForeignKey(
+        'students.Student',
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='attendance_changes',
+        verbose_name='Участник'
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Пользователь'
+    )
+    old_status = models.PositiveSmallIntegerField('Было', null=True, blank=True, help_text='Пусто - запись создана')
+    new_status = models.PositiveSmallIntegerField('Стало')
+    source = models.PositiveSmallIntegerField('Источник', choices=CHANGE_SOURCE_CHOICES, default=CHANGE_SOURCE_SYSTEM)
+    changed_at = models.DateTimeField('Время изменения', default=timezone.now)
+
+    objects = AttendanceChangeQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Изменение посещаемости'
+        verbose_name_plural = 'Журнал изменений посещаемости'
+        indexes = [
+            models.Index(fields=['repetition', '-changed_at'], name='attendance_change_rep_idx'),
+            models.Index(fields=['student', '-changed_at'], name='attendance_change_student_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_id}: {self.old_status_value or '-'} -> {self.new_status_value}"
+
+    @property
+    def old_status_value(self):
+        return STATUS_BY_CODE.get(self.old_status)
+
+    @property
+    def new_status_value(self):
+        return STATUS_BY_CODE.get(self.new_status)
+
+    def get_old_status_display(self):
+        return dict(STATUS_CHOICES).get(self.old_status_value, '')
+
+    def get_new_status_display(self):
+        return dict(STATUS_CHOICES).get(self.new_status_value, '')
+
+
+class CalendarVersion(models.Model):
+    """Версия данных календаря группы за месяц (ключ кеша матрицы календаря).
+
+    Счетчик увеличивается в той же транзакции, что и изменение занятий и отметок
+    месяца (attendance/calendar_cache.py: touch_calendar). Строка с month=ROSTER -
+    версия состава группы, общая для всех месяцев. Строки нет - версия 0."""
+
+    ROSTER = date(1, 1, 1)
+
+    group = models.ForeignKey(
+        'students.Group',
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Группа'
+    )
+    month = models.DateField('Месяц', help_text='Первое число месяца; 01.01.0001 - состав группы')
+    version = models.PositiveIntegerField('Версия', default=0)
+
+    class Meta:
+        verbose_name = 'Версия календаря'
+        verbose_name_plural = 'Версии календаря'
+        unique_together = ['group', 'month']
@@ -0,0 +1,99 @@
+"""Помесячная статистика посещаемости (модель MonthlyAttendanceStat).
+
+Одна строка - число отметок каждого статуса у участника в группе за месяц. Отчеты за
+учебный год суммируют не больше 12 строк на участника вместо сотен записей.
+
+В PostgreSQL это материализованное представление с уникальным индексом: команда
+refresh_attendance_stats обновляет его с REFRESH ... CONCURRENTLY, и чтение во время
+обновления не блокируется. В SQLite (разработка, тесты) вместо представления обычная
+таблица, которую обновление перезаписывает целиком.
+
+Данные обновляются только командой (ее каждые 15 минут запускает сервис stats в
+docker-compose.yml), поэтому отчеты, которым важны отметки последних
+минут, берут закрытые месяцы отсюда, а текущий месяц считают по AttendanceRecord."""
+
+from django.db import transaction
+
+from attendance.constants import STATUS_CHOICES
+
+VIEW = 'attendance_monthlyattendancestat'
+STATUSES = [value for value, _ in STATUS_CHOICES]
+
+MONTH_EXPRESSIONS = {
+    'postgresql': "date_trunc('month', record.repetition_date)::date",
+    'sqlite': "date(record.repetition_date, 'start of month')",
+}
+
+
+def stats_select_sql(connection):
+    """SELECT, вычисляющий статистику по основной таблице"""
+
+    counts = ',\n'.join(
+        f"    COUNT(CASE WHEN record.status = '{status}' THEN 1 END) AS {status}_count"
+        for status in STATUSES
+    )
+    return (
+        f'SELECT {MONTH_EXPRESSIONS[connection.vendor]} AS month,\n'
+        f'    repetition.group_id AS group_id,\n'
+        f'    record.student_id AS student_id,\n'
+        f'{counts},\n'
+        f'    COUNT(*) AS total_count\n'
+        f'FROM attendance_attendancerecord record\n'
+        f'JOIN attendance_repetition repetition ON repetition.id = record.repetition_id\n'
+        f'GROUP BY 1, 2, 3'
+    )
+
+
+def stats_view_exists(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [VIEW])
+            return cursor.fetchone()[0]
+        return VIEW in connection.introspection.table_names(cursor)
+
+
+def create_stats_view(connection):
+    """Создает и заполняет представление (в SQLite - таблицу)"""
+
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'CREATE MATERIALIZED VIEW {qn(VIEW)} AS {stats_select_sql(connection)}')
+            # Уникальный индекс обязателен для REFRESH MATERIALIZED VIEW CONCURRENTLY
+            cursor.execute(f'CREATE UNIQUE INDEX {qn(VIEW + "_pk")} ON {qn(VIEW)} (month, group_id, student_id)')
+            cursor.execute(f'CREATE INDEX {qn(VIEW + "_student")} ON {qn(VIEW)} (student_id, month)')
+            return
+
+        counts = ', '.join(f'{status}_count integer NOT NULL' for status in STATUSES)
+        cursor.execute(
+            f'CREATE TABLE {qn(VIEW)} (month date NOT NULL, group_id bigint NOT NULL, student_id bigint NOT NULL, '
+            f'{counts}, total_count integer NOT NULL, PRIMARY KEY (month, group_id, student_id))'
+        )
+        cursor.execute(f'CREATE INDEX {qn(VIEW + "_student")} ON {qn(VIEW)} (student_id, month)')
+    refresh_stats(connection)
+
+
+def drop_stats_view(connection):
+    qn = connection.ops.quote_name
+    kind = 'MATERIALIZED VIEW' if connection.vendor == 'postgresql' else 'TABLE'
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP {kind} IF EXISTS {qn(VIEW)}')
+
+
+def refresh_stats(connection, concurrently=True):
+    """Пересчитывает статистику.
+
+        Аргументы:
+            connection: Соединение с основной базой
+            concurrently (bool): В PostgreSQL не блокировать чтение на время обновления
+                (дольше и требует уникального индекса, который create_stats_view создает)"""
+
+    qn = connection.ops.quote_name
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'REFRESH MATERIALIZED VIEW {"CONCURRENTLY " if concurrently else ""}{qn(VIEW)}')
+        return
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {qn(VIEW)}')
+        cursor.execute(f'INSERT INTO {qn(VIEW)} {stats_select_sql(connection)}')
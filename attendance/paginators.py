@@ -0,0 +1,59 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_row_count(model, using='default'):
+    """Оценка числа строк таблицы по статистике PostgreSQL (pg_class.reltuples).
+
+    Для секционированной таблицы суммируются оценки секций. Возвращает None, если
+    оценка недоступна: другая СУБД или таблица еще ни разу не анализировалась."""
+
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT SUM(GREATEST(child.reltuples, 0)), BOOL_OR(child.reltuples >= 0)
+            FROM pg_class child
+            WHERE child.oid = to_regclass(%s) AND child.relkind = 'r'
+               OR child.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = to_regclass(%s))
+            """,
+            [model._meta.db_table, model._meta.db_table],
+        )
+        total, analyzed = cursor.fetchone()
+    return int(total) if analyzed else None
+
+
+class LargeTablePaginator(Paginator):
+    """Пагинатор для больших таблиц в админке.
+
+    - Без фильтров число строк берется из статистики PostgreSQL вместо COUNT(*).
+    - С фильтрами строки считаются точно, но не больше max_exact_count: дальше
+      этого количества страницы не показываются, нужно сузить фильтр.
+    - Глубокие страницы (со смещением больше deferred_join_offset) читаются в два
+      шага: сначала OFFSET/LIMIT по одним id (index-only scan индекса сортировки),
+      затем полные строки только для найденных id."""
+
+    max_exact_count = 10000
+    deferred_join_offset = 1000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None:
+                return estimate
+        return queryset.order_by()[:self.max_exact_count].count()
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if bottom < self.deferred_join_offset:
+            return super().page(number)
+
+        ids = list(self.object_list.values_list('pk', flat=True)[bottom:top])
+        return self._get_page(self.object_list.filter(pk__in=ids), number, self)
@@ -0,0 +1,229 @@
+"""Секционирование таблицы посещаемости по учебным годам (только PostgreSQL).
+
+Таблица attendance_attendancerecord становится секционированной по диапазону
+repetition_date: одна секция на учебный год (1 июня - 31 мая, как в
+get_academic_year_dates) и секция DEFAULT для дат, для которых секция еще не создана.
+ORM и админка работают с родительской таблицей как раньше, а запросы с условием на
+repetition_date читают только нужные секции.
+
+Ограничения PostgreSQL: первичный ключ секционированной таблицы - (id, repetition_date),
+и любой уникальный индекс/ограничение на AttendanceRecord тоже должен включать
+repetition_date."""
+
+from datetime import date
+
+from django.conf import settings
+
+from attendance.monthly_stats import create_stats_view, drop_stats_view, stats_view_exists
+from attendance.utils import get_academic_year_dates
+
+TABLE = 'attendance_attendancerecord'
+PARTITION_KEY = 'repetition_date'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def partitioning_enabled(connection):
+    """Секционирование включено настройкой ATTENDANCE_PARTITIONING и доступно только в PostgreSQL"""
+
+    return settings.ATTENDANCE_PARTITIONING and connection.vendor == 'postgresql'
+
+
+def is_partitioned(connection, table=TABLE):
+    """Проверяет, является ли таблица секционированной (relkind = 'p')"""
+
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table]
+        )
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def academic_year_start(day):
+    """Год начала учебного года, к которому относится дата"""
+
+    return get_academic_year_dates(day)[0].year
+
+
+def partition_name(start_year):
+    return f'{TABLE}_y{start_year}'
+
+
+def partition_bounds(start_year):
+    """Границы секции: [1 июня start_year, 1 июня start_year + 1)"""
+
+    return date(start_year, 6, 1), date(start_year + 1, 6, 1)
+
+
+def list_partitions(connection):
+    """Список (имя секции, выражение границ) для секционированной таблицы"""
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.oid = to_regclass(%s)
+            ORDER BY child.relname
+            """,
+            [TABLE],
+        )
+        return cursor.fetchall()
+
+
+def _insertable_columns(cursor, table):
+    """Колонки таблицы без генерируемых (в них нельзя вставлять значения)"""
+
+    cursor.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = %s AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+        """,
+        [table],
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def create_partition(connection, start_year):
+    """Создает секцию учебного года, если ее еще нет.
+
+    Строки этого учебного года, успевшие попасть в секцию DEFAULT, переносятся в новую
+    секцию в той же транзакции, иначе PostgreSQL не дал бы подключить секцию.
+
+        Возвращает:
+            bool: True, если секция была создана"""
+
+    qn = connection.ops.quote_name
+    name = partition_name(start_year)
+    start, end = partition_bounds(start_year)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s)', [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+
+        cursor.execute(
+            f'CREATE TABLE {qn(name)} (LIKE {qn(TABLE)} INCLUDING DEFAULTS INCLUDING GENERATED)'
+        )
+        columns = ', '.join(qn(column) for column in _insertable_columns(cursor, TABLE))
+        cursor.execute(
+            f'WITH moved AS ('
+            f'DELETE FROM {qn(DEFAULT_PARTITION)} WHERE {qn(PARTITION_KEY)} >= %s AND {qn(PARTITION_KEY)} < %s '
+            f'RETURNING {columns}) '
+            f'INSERT INTO {qn(name)} ({columns}) SELECT {columns} FROM moved',
+            [start, end],
+        )
+        cursor.execute(
+            f'ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(name)} FOR VALUES FROM (%s) TO (%s)',
+            [start, end],
+        )
+    return True
+
+
+def detach_partition(connection, start_year):
+    """Отсоединяет секцию учебного года: она остается обычной таблицей для архива
+    (pg_dump/перенос в другое табличное пространство) и больше не видна через ORM"""
+
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(partition_name(start_year))}')
+
+
+def convert_to_partitioned(schema_editor, model):
+    """Перестраивает обычную таблицу в секционированную, сохраняя данные.
+
+    Вызывается из миграции (или команды attendance_partitions --convert) внутри
+    транзакции: таблица блокируется на время копирования."""
+
+    connection = schema_editor.connection
+    qn = schema_editor.quote_name
+    new_table = f'{TABLE}_partitioned'
+    sequence = f'{TABLE}_id_seq'
+    today_year = academic_year_start(date.today())
+    # Представление статистики зависит от таблицы и пересоздается после перестройки
+    has_stats = stats_view_exists(connection)
+    if has_stats:
+        drop_stats_view(connection)
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {qn(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        cursor.execute(f'SELECT MIN({qn(PARTITION_KEY)}), MAX({qn(PARTITION_KEY)}) FROM {qn(TABLE)}')
+        min_date, max_date = cursor.fetchone()
+        columns = ', '.join(qn(column) for column in _insertable_columns(cursor, TABLE))
+
+        # LIKE не переносит identity: id получает обычную последовательность
+        cursor.execute(
+            f'CREATE TABLE {qn(new_table)} (LIKE {qn(TABLE)} INCLUDING DEFAULTS INCLUDING GENERATED, '
+            f'CONSTRAINT {qn(new_table + "_pkey")} PRIMARY KEY (id, {qn(PARTITION_KEY)})) '
+            f'PARTITION BY RANGE ({qn(PARTITION_KEY)})'
+        )
+        cursor.execute(f'CREATE SEQUENCE {qn(new_table + "_id_seq")} OWNED BY {qn(new_table)}.id')
+        cursor.execute(
+            f"ALTER TABLE {qn(new_table)} ALTER COLUMN id SET DEFAULT nextval('{new_table}_id_seq')"
+        )
+
+        first_year = academic_year_start(min_date) if min_date else today_year
+        last_year = max(academic_year_start(max_date) if max_date else today_year, today_year + 1)
+        for start_year in range(first_year, last_year + 1):
+            start, end = partition_bounds(start_year)
+            cursor.execute(
+                f'CREATE TABLE {qn(partition_name(start_year))} PARTITION OF {qn(new_table)} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [start, end],
+            )
+        cursor.execute(f'CREATE TABLE {qn(DEFAULT_PARTITION)} PARTITION OF {qn(new_table)} DEFAULT')
+
+        cursor.execute(f'INSERT INTO {qn(new_table)} ({columns}) SELECT {columns} FROM {qn(TABLE)}')
+        cursor.execute(
+            f"SELECT setval('{new_table}_id_seq', COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {qn(new_table)}"
+        )
+
+        # Старая таблица уносит с собой identity-последовательность, индексы и внешние ключи
+        cursor.execute(f'DROP TABLE {qn(TABLE)}')
+        cursor.execute(f'ALTER TABLE {qn(new_table)} RENAME TO {qn(TABLE)}')
+        cursor.execute(f'ALTER TABLE {qn(TABLE)} RENAME CONSTRAINT {qn(new_table + "_pkey")} TO {qn(TABLE + "_pkey")}')
+        cursor.execute(f'ALTER SEQUENCE {qn(new_table + "_id_seq")} RENAME TO {qn(sequence)}')
+        cursor.execute(f"ALTER TABLE {qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')")
+
+    # Индексы и внешние ключи создаются с теми же именами, что дал бы Django,
+    # чтобы последующие миграции находили их как обычно
+    for statement in schema_editor._model_indexes_sql(model):
+        schema_editor.execute(statement)
+    for field in model._meta.local_fields:
+        if field.remote_field and field.db_constraint:
+            schema_editor.execute(schema_editor._create_fk_sql(model, field, '_fk_%(to_table)s_%(to_column)s'))
+    if has_stats:
+        create_stats_view(connection)
+
+
+def convert_to_plain(schema_editor, model):
+    """Обратное преобразование: секционированная таблица снова становится обычной"""
+
+    connection = schema_editor.connection
+    qn = schema_editor.quote_name
+    backup = f'{TABLE}_backup'
+    has_stats = stats_view_exists(connection)
+
+    with connection.cursor() as cursor:
+        columns = ', '.join(qn(column) for column in _insertable_columns(cursor, TABLE))
+        cursor.execute(f'CREATE TABLE {qn(backup)} AS SELECT {columns} FROM {qn(TABLE)}')
+        cursor.execute(f'DROP TABLE {qn(TABLE)} CASCADE')
+
+    schema_editor.create_model(model)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {qn(TABLE)} ({columns}) OVERRIDING SYSTEM VALUE SELECT {columns} FROM {qn(backup)}'
+        )
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) "
+            f"FROM {qn(TABLE)}",
+            [TABLE],
+        )
+        cursor.execute(f'DROP TABLE {qn(backup)}')
+    if has_stats:
+        create_stats_view(connection)
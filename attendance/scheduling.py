@@ -0,0 +1,138 @@
+"""Проверка пересечений занятий по времени.
+
+В PostgreSQL пересечения запрещены ограничениями-исключениями с GiST-индексами:
+у одной группы (и в одном зале, если он указан) не может быть двух занятий, чьи
+интервалы [начало, начало + длительность) пересекаются. Смежные занятия (одно
+кончается в 19:30, другое начинается в 19:30) допустимы.
+
+Ограничения создаются миграцией только в PostgreSQL и не объявлены в Meta модели:
+SQLite их не поддерживает. Форма проверяет пересечения заранее через
+find_overlaps - в PostgreSQL это поиск по тому же GiST-индексу, в SQLite - по
+индексу (date, group, start_time) с проверкой нескольких занятий соседних дней.
+Одновременные сохранения, проскочившие проверку, останавливает база
+(IntegrityError, см. is_overlap_error)."""
+
+from datetime import datetime, timedelta
+
+from django.db import connection
+from django.db.models import BooleanField, Q
+from django.db.models.expressions import RawSQL
+
+TABLE = 'attendance_repetition'
+GROUP_CONSTRAINT = 'attendance_repetition_group_no_overlap'
+HALL_CONSTRAINT = 'attendance_repetition_hall_no_overlap'
+
+# Интервал занятия; выражение совпадает с выражением ограничений, поэтому запрос
+# с && по нему использует их GiST-индексы
+SLOT_SQL = (
+    f'tsrange("{TABLE}"."date" + "{TABLE}"."start_time", '
+    f'"{TABLE}"."date" + "{TABLE}"."start_time" + make_interval(mins => "{TABLE}"."duration"))'
+)
+
+
+def slot_bounds(day, start_time, duration):
+    """Начало и конец занятия"""
+
+    start = datetime.combine(day, start_time)
+    return start, start + timedelta(minutes=duration)
+
+
+def find_overlaps(repetition):
+    """Занятия той же группы или того же зала, пересекающиеся с repetition по времени.
+
+        Аргументы:
+            repetition (Repetition): Новое или изменяемое занятие (может быть не сохранено)
+
+        Возвращает:
+            list: Пересекающиеся занятия в порядке начала"""
+
+    from attendance.models import Repetition
+
+    start, end = slot_bounds(repetition.date, repetition.start_time, repetition.duration)
+    owner = Q(group_id=repetition.group_id)
+    if repetition.hall:
+        owner |= Q(hall=repetition.hall)
+    candidates = Repetition.objects.filter(owner).select_related('group').order_by('date', 'start_time')
+    if repetition.pk:
+        candidates = candidates.exclude(pk=repetition.pk)
+
+    if connection.vendor == 'postgresql':
+        return list(candidates.filter(
+            RawSQL(f'{SLOT_SQL} && tsrange(%s, %s)', [start, end], output_field=BooleanField())
+        ))
+
+    # Занятие могло начаться накануне и закончиться после полуночи
+    candidates = candidates.filter(date__gte=start.date() - timedelta(days=1), date__lte=end.date())
+    return [
+        other for other in candidates
+        if start < slot_bounds(other.date, other.start_time, other.duration)[1]
+        and slot_bounds(other.date, other.start_time, other.duration)[0] < end
+    ]
+
+
+def describe_overlaps(repetition, overlaps):
+    """Текст ошибки формы со списком пересечений"""
+
+    lines = []
+    for other in overlaps:
+        _, end = slot_bounds(other.date, other.start_time, other.duration)
+        where = f'группа {other.group}' if other.group_id == repetition.group_id else f'зал «{other.hall}»'
+        lines.append(f'{other.date:%d.%m.%Y} {other.start_time:%H:%M}-{end:%H:%M} ({where})')
+    return 'Занятие пересекается по времени с: ' + '; '.join(lines)
+
+
+def is_overlap_error(error):
+    """IntegrityError вызван ограничением на пересечение занятий"""
+
+    return GROUP_CONSTRAINT in str(error) or HALL_CONSTRAINT in str(error)
+
+
+def find_existing_overlaps(cursor):
+    """Пары пересекающихся занятий в таблице (id, id) - до создания ограничений"""
+
+    cursor.execute(
+        f"""
+        SELECT a.id, b.id FROM {TABLE} a JOIN {TABLE} b
+            ON a.id < b.id
+           AND (a.group_id = b.group_id OR (a.hall <> '' AND a.hall = b.hall))
+           AND b.date BETWEEN a.date - 1 AND a.date + 1
+        WHERE tsrange(a.date + a.start_time, a.date + a.start_time + make_interval(mins => a.duration))
+           && tsrange(b.date + b.start_time, b.date + b.start_time + make_interval(mins => b.duration))
+        ORDER BY a.id
+        """
+    )
+    return cursor.fetchall()
+
+
+def create_overlap_constraints(schema_editor):
+    """Ограничения-исключения (PostgreSQL, нужно расширение btree_gist).
+
+        Исключения:
+            RuntimeError: Если в таблице уже есть пересекающиеся занятия"""
+
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        overlaps = find_existing_overlaps(cursor)
+        if overlaps:
+            pairs = ', '.join(f'{first}/{second}' for first, second in overlaps[:20])
+            raise RuntimeError(
+                f'Найдены пересекающиеся занятия ({len(overlaps)}), исправьте их и повторите migrate: {pairs}'
+            )
+        slot = SLOT_SQL.replace(f'"{TABLE}".', '')
+        cursor.execute(
+            f'ALTER TABLE {TABLE} ADD CONSTRAINT {GROUP_CONSTRAINT} '
+            f'EXCLUDE USING gist (group_id WITH =, {slot} WITH &&)'
+        )
+        cursor.execute(
+            f'ALTER TABLE {TABLE} ADD CONSTRAINT {HALL_CONSTRAINT} '
+            f"EXCLUDE USING gist (hall WITH =, {slot} WITH &&) WHERE (hall <> '')"
+        )
+
+
+def drop_overlap_constraints(schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for name in (GROUP_CONSTRAINT, HALL_CONSTRAINT):
+            cursor.execute(f'ALTER TABLE {TABLE} DROP CONSTRAINT IF EXISTS {name}')
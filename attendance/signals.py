@@ -0,0 +1,49 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from attendance.calendar_cache import touch_calendar, touch_record_calendar
+from attendance.events import publish_changes, record_change
+from attendance.journal import log_change
+from attendance.models import AttendanceRecord, Repetition
+from students.models import Student
+
+
+# post_delete для записей не подключается: он отключил бы быстрое удаление
+# queryset.delete() (например, при архивации). Каскадное удаление покрыто сигналами
+# занятия и участника, удаление в админке меняет версию календаря явно
+@receiver(post_save, sender=AttendanceRecord)
+def attendance_record_changed(sender, instance, created, **kwargs):
+    touch_record_calendar(instance)
+    # Запись перенесли на другое занятие: меняется и месяц прежнего занятия
+    loaded_repetition_id = getattr(instance, '_loaded_repetition_id', None)
+    if loaded_repetition_id not in (None, instance.repetition_id):
+        previous = Repetition.objects.filter(pk=loaded_repetition_id).values_list('group_id', 'date').first()
+        if previous:
+            touch_calendar(*previous)
+
+    publish_changes(instance.repetition_id, [record_change(instance.student_id, instance.status, instance.notes)])
+
+    # Прежний статус известен, если запись создана или загружена из базы
+    if created or hasattr(instance, '_loaded_status'):
+        old_status = None if created else instance._loaded_status
+        log_change(instance.pk, instance.repetition_id, instance.student_id, old_status, instance.status,
+                   instance.updated_at)
+    instance._loaded_status = instance.status
+
+
+@receiver([post_save, post_delete], sender=Repetition)
+def repetition_changed(sender, instance, **kwargs):
+    touch_calendar(instance.group_id, instance.date)
+    # Занятие перенесли на другой месяц или в другую группу
+    loaded = (getattr(instance, '_loaded_group_id', None), getattr(instance, '_loaded_date', None))
+    if None not in loaded and loaded != (instance.group_id, instance.date):
+        touch_calendar(*loaded)
+    instance._loaded_group_id, instance._loaded_date = instance.group_id, instance.date
+
+
+@receiver([post_save, post_delete], sender=Student)
+def student_changed(sender, instance, **kwargs):
+    # Состав группы показан во всех месяцах ее календаря
+    for group_id in {instance.group_id, getattr(instance, '_loaded_group_id', None)} - {None}:
+        touch_calendar(group_id)
+    instance._loaded_group_id = instance.group_id
@@ -4,4 +4,11 @@ register = template.Library()
 
 @register.filter
 def get_item(dictionary, key):
-    return dictionary.get(key)
\ No newline at end of file
+    return dictionary.get(key)
+
+
+@register.inclusion_tag('attendance/includes/calendar_row.html')
+def calendar_row(row):
+    """Строка календаря посещаемости из заранее подготовленных ячеек (см. calendar_data)"""
+
+    return {'row': row}
@@ -1,6 +1,8 @@
 from django.urls import path
 from attendance.views import (HomeView, RepetitionListView, AttendanceFormView, RepetitionCreateView, CalendarView,
-                              RepetitionEditView, RepetitionDeleteView)
+                              RepetitionEditView, RepetitionDeleteView, QuickAttendanceView,
+                              AttendanceEventsView, StudentHistoryView, StudentHistoryJsonView,
+                              GroupScheduleFeedView, TeacherScheduleFeedView)
 
 app_name = 'attendance'
 
@@ -8,9 +10,15 @@ urlpatterns = [
     path('', HomeView.as_view(), name='home'),
     path('groups/<int:pk>/repetitions/', RepetitionListView.as_view(), name='repetition_list'),
     path('repetitions/<int:pk>/attendance/', AttendanceFormView.as_view(), name='attendance_form'),
+    path('repetitions/<int:pk>/attendance/quick/', QuickAttendanceView.as_view(), name='attendance_quick'),
+    path('repetitions/<int:pk>/events/', AttendanceEventsView.as_view(), name='attendance_events'),
     path('groups/<int:pk>/repetitions/create/', RepetitionCreateView.as_view(), name='repetition_create'),
     path('repetitions/<int:pk>/edit/', RepetitionEditView.as_view(), name='repetition_edit'),
     path('groups/<int:pk>/calendar/<int:year>/<int:month>/', CalendarView.as_view(), name='calendar_view'),
     path('groups/<int:pk>/calendar/', CalendarView.as_view(), name='calendar_current'),
     path('repetitions/<int:pk>/delete/', RepetitionDeleteView.as_view(), name='repetition_delete'),
+    path('students/<int:pk>/history/', StudentHistoryView.as_view(), name='student_history'),
+    path('groups/<int:pk>/schedule.ics', GroupScheduleFeedView.as_view(), name='group_schedule_feed'),
+    path('teachers/<int:pk>/schedule.ics', TeacherScheduleFeedView.as_view(), name='teacher_schedule_feed'),
+    path('students/<int:pk>/history.json', StudentHistoryJsonView.as_view(), name='student_history_json'),
 ]
\ No newline at end of file
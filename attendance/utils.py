@@ -21,4 +21,10 @@ def get_academic_year_dates(today=None):
         start_date = date(today.year - 1, 6, 1)
         end_date = date(today.year, 5, 31)
 
-    return start_date, end_date
\ No newline at end of file
+    return start_date, end_date
+
+
+def current_academic_year(today=None):
+    """Год начала учебного года, к которому относится дата (по умолчанию - сегодня)"""
+
+    return get_academic_year_dates(today)[0].year
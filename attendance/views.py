@@ -1,19 +1,39 @@
+import asyncio
+from collections import defaultdict
 from datetime import timedelta, date
+
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models.functions import Cast
+from django.db.models.functions import Cast, Coalesce
 from django.utils import timezone
+from django.views import View
 from django.views.generic import ListView, FormView, CreateView, TemplateView, UpdateView, DeleteView
-from django.db.models import Count, Q, Prefetch, Case, When, Value, ExpressionWrapper, F, FloatField
+from django.db.models import (Count, Q, Case, When, Value, ExpressionWrapper, F, FloatField, OuterRef,
+                              Subquery)
 from django.forms import modelformset_factory
-from django.shortcuts import get_object_or_404, reverse
+from django.shortcuts import get_object_or_404, render, reverse
 from django.contrib import messages
-from django.http import HttpResponseRedirect
+from django.db import IntegrityError, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
 from django.template.defaulttags import register
-
-from attendance.models import Repetition, AttendanceRecord
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from attendance.constants import CHANGE_SOURCE_FORM, CHANGE_SOURCE_QUICK, PRESENT_STATUSES, STATUS_CHOICES
+from attendance.events import get_broker, publish_changes, record_change
+from attendance.models import MonthlyAttendanceStat, Repetition, AttendanceRecord
 from students.models import Group, Student
 from attendance.utils import get_academic_year_dates
+from attendance.calendar_cache import get_calendar_matrix, prefetch_adjacent_months, touch_calendar
 from attendance.forms import AttendanceRecordForm
+from attendance.ical import cache_key, caching_stream, feed_version, feed_window_start, iter_calendar
+from attendance.history import HISTORY_MAX_PAGE_SIZE, HISTORY_PAGE_SIZE, history_page
+from attendance.journal import journal_batch, log_change
+from attendance.scheduling import is_overlap_error
+from config.db_router import ReportingViewMixin
 
 
 @register.filter
@@ -21,51 +41,63 @@ def get_item(dictionary, key):
     return dictionary.get(key)
 
 
-class HomeView(ListView):
+class HomeView(ReportingViewMixin, ListView):
     """Контроллер для отображения домашней страницы"""
     model = Group
     template_name = 'attendance/home.html'
     context_object_name = 'groups'
 
     def get_queryset(self):
-        start_date, end_date = get_academic_year_dates()
-        today = timezone.now().date()
+        """Активные группы с размером состава и числом занятий за учебный год.
 
-        # Основной запрос для групп
-        groups = Group.objects.filter(is_active=True).prefetch_related(
-            Prefetch(
-                'repetition_set',
-                queryset=Repetition.objects.filter(date=today),
-                to_attr='todays_repetitions'
-            ),
-            'students'
-        ).order_by('id')
-
-        # Рассчитываем статистику посещаемости отдельным запросом
-        attendance_stats = Group.objects.filter(
-            is_active=True,
-            repetition__date__gte=start_date,
-            repetition__date__lte=end_date
-        ).values('id').annotate(
-            total_repetitions=Count('repetition', distinct=True),
-            total_attendance=Count('repetition__attendance_records'),
-            present_attendance=Count(
-                'repetition__attendance_records',
-                filter=Q(repetition__attendance_records__status__in=['present', 'late'])
-            )
-        )
+        Оба значения считаются коррелированными подзапросами в одном SELECT, поэтому
+        экземпляры участников и занятий не загружаются. Посещаемость за прошедшие месяцы
+        берется из MonthlyAttendanceStat, за текущий - запросом с группировкой по группе:
+        условие на repetition_date позволяет PostgreSQL читать только свежие строки
+        секции текущего учебного года."""
 
-        # Создаем словарь для быстрого доступа к статистике
-        stats_dict = {stat['id']: stat for stat in attendance_stats}
+        start_date, end_date = get_academic_year_dates()
 
-        # Добавляем статистику к каждому объекту группы
-        for group in groups:
-            stats = stats_dict.get(group.id, {})
-            group.current_year_repetitions = stats.get('total_repetitions', 0)
-            group.total_attendance = stats.get('total_attendance', 0)
-            group.present_attendance = stats.get('present_attendance', 0)
+        students_count = Student.objects.active().filter(group=OuterRef('pk')).values('group').annotate(
+            count=Count('pk')
+        ).values('count')
+        repetitions_count = Repetition.objects.filter(
+            group=OuterRef('pk'),
+            date__gte=start_date,
+            date__lte=end_date
+        ).values('group').annotate(count=Count('pk')).values('count')
+
+        groups = list(Group.objects.filter(is_active=True).annotate(
+            students_count=Coalesce(Subquery(students_count), 0),
+            current_year_repetitions=Coalesce(Subquery(repetitions_count), 0),
+        ).order_by('id'))
+
+        # Прошедшие месяцы - из помесячной статистики (до 12 строк на участника),
+        # текущий месяц - по записям, чтобы свежие отметки сразу попадали в процент
+        month_start = max(timezone.now().date().replace(day=1), start_date)
+        stats_dict = defaultdict(lambda: (0, 0))
+        closed_months = MonthlyAttendanceStat.objects.filter(
+            month__gte=start_date,
+            month__lt=month_start,
+            group__is_active=True
+        ).totals('group_id')
+        for row in closed_months:
+            stats_dict[row['group_id']] = (row['total'], sum(row[status] for status in PRESENT_STATUSES))
+
+        recent = AttendanceRecord.objects.filter(
+            repetition_date__gte=month_start,
+            repetition_date__lte=end_date,
+            repetition__group__is_active=True
+        ).values_list('repetition__group_id').annotate(
+            total_attendance=Count('id'),
+            present_attendance=Count('id', filter=Q(status__in=PRESENT_STATUSES))
+        ).order_by()
+        for group_id, total, present in recent:
+            closed_total, closed_present = stats_dict[group_id]
+            stats_dict[group_id] = (closed_total + total, closed_present + present)
 
-            # Рассчитываем процент посещаемости
+        for group in groups:
+            group.total_attendance, group.present_attendance = stats_dict.get(group.id, (0, 0))
             if group.total_attendance > 0:
                 group.attendance_percent = (group.present_attendance / group.total_attendance) * 100
             else:
@@ -75,10 +107,9 @@ class HomeView(ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        today = timezone.now().date()
         context['todays_repetitions'] = Repetition.objects.filter(
-            date=today,
-            group__in=context['groups']
+            date=timezone.now().date(),
+            group__is_active=True
         ).select_related('group').order_by('start_time')
         return context
 
@@ -130,31 +161,52 @@ class RepetitionListView(ListView):
         return context
 
 
-class RepetitionCreateView(CreateView):
-    """Контроллер для создания новой репетиции"""
+class RepetitionFormMixin:
+    """Общее для создания и редактирования репетиции: поля и обработка пересечений.
+
+    Пересечения с другими занятиями находит Repetition.clean() при проверке формы;
+    если два сохранения одновременно прошли проверку, второе останавливает
+    ограничение базы, и пользователь видит ту же ошибку формы."""
+
     model = Repetition
-    fields = ['date', 'start_time', 'duration', 'notes']
+    fields = ['date', 'start_time', 'duration', 'hall', 'notes']
     template_name = 'attendance/repetition_form.html'
 
     def form_valid(self, form):
-        form.instance.group = get_object_or_404(Group, pk=self.kwargs['pk'])
-        return super().form_valid(form)
+        try:
+            with transaction.atomic():
+                return super().form_valid(form)
+        except IntegrityError as error:
+            if not is_overlap_error(error):
+                raise
+            form.add_error(None, 'Занятие пересекается по времени с другим занятием группы или зала')
+            return self.form_invalid(form)
+
+
+class RepetitionCreateView(RepetitionFormMixin, CreateView):
+    """Контроллер для создания новой репетиции"""
+
+    def dispatch(self, request, *args, **kwargs):
+        self.group = get_object_or_404(Group, pk=self.kwargs['pk'])
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_form(self, form_class=None):
+        form = super().get_form(form_class)
+        # Группа нужна уже при проверке формы: по ней ищутся пересечения
+        form.instance.group = self.group
+        return form
 
     def get_success_url(self):
         return reverse('attendance:repetition_list', kwargs={'pk': self.kwargs['pk']})
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        group = get_object_or_404(Group, pk=self.kwargs['pk'])
-        context['group'] = group
+        context['group'] = self.group
         context['is_edit'] = False  # Флаг для шаблона, что это создание
         return context
 
-class RepetitionEditView(UpdateView):
+class RepetitionEditView(RepetitionFormMixin, UpdateView):
     """Контроллер для редактирования существующей репетиции"""
-    model = Repetition
-    fields = ['date', 'start_time', 'duration', 'notes']
-    template_name = 'attendance/repetition_form.html'
     pk_url_kwarg = 'pk'  # Параметр из URL для идентификации репетиции
 
     def get_context_data(self, **kwargs):
@@ -196,21 +248,21 @@ class AttendanceFormView(FormView):
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         self.repetition = get_object_or_404(Repetition, pk=self.kwargs['pk'])
-        self.students = self.repetition.group.students.all()
+        self.students = self.repetition.group.students.active()
 
         # Создаем или получаем записи посещаемости
         records = []
-        for student in self.students:
-            record, created = AttendanceRecord.objects.get_or_create(
-                repetition=self.repetition,
-                student=student,
-                defaults={
-                    'present': False,
-                    'status': 'absent',
-                    'notes': ''
-                }
-            )
-            records.append(record)
+        with journal_batch(self.request.user, CHANGE_SOURCE_FORM):
+            for student in self.students:
+                record, created = AttendanceRecord.objects.get_or_create(
+                    repetition=self.repetition,
+                    student=student,
+                    defaults={
+                        'status': 'absent',
+                        'notes': ''
+                    }
+                )
+                records.append(record)
 
         kwargs['queryset'] = AttendanceRecord.objects.filter(
             pk__in=[r.pk for r in records]
@@ -232,7 +284,9 @@ class AttendanceFormView(FormView):
         return context
 
     def form_valid(self, form):
-        form.save()
+        # Журнал изменений записывается одним INSERT в той же транзакции
+        with transaction.atomic(), journal_batch(self.request.user, CHANGE_SOURCE_FORM):
+            form.save()
         messages.success(self.request, 'Посещаемость успешно сохранена!')
         return HttpResponseRedirect(self.get_success_url())
 
@@ -240,7 +294,143 @@ class AttendanceFormView(FormView):
         return reverse('attendance:repetition_list', kwargs={'pk': self.repetition.group.id})
 
 
-class CalendarView(TemplateView):
+class QuickAttendanceView(View):
+    """Облегченная отметка посещаемости для больших групп.
+
+    В отличие от AttendanceFormView не строит formset: таблица рендерится из значений
+    (values_list) с общим для всех строк списком статусов, POST проверяется одним
+    проходом по составу группы, а изменения записываются через bulk_create/bulk_update."""
+
+    template_name = 'attendance/attendance_quick.html'
+
+    def dispatch(self, request, *args, **kwargs):
+        self.repetition = get_object_or_404(Repetition.objects.select_related('group'), pk=kwargs['pk'])
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_roster(self):
+        """Активные участники группы: список (id, полное имя)"""
+
+        return [
+            (student_id, ' '.join(part for part in (last_name, first_name, middle_name) if part))
+            for student_id, last_name, first_name, middle_name in Student.objects.active().filter(
+                group_id=self.repetition.group_id
+            ).order_by('last_name', 'first_name').values_list('id', 'last_name', 'first_name', 'middle_name')
+        ]
+
+    def get_records(self):
+        """Существующие записи занятия: {student_id: (id записи, статус, комментарий)}"""
+
+        return {
+            student_id: (pk, status, notes)
+            for pk, student_id, status, notes in self.repetition.attendance_records.values_list(
+                'pk', 'student_id', 'status', 'notes'
+            )
+        }
+
+    def render(self, rows, errors=None):
+        return render(self.request, self.template_name, {
+            'repetition': self.repetition,
+            'group': self.repetition.group,
+            'rows': rows,
+            'status_choices': STATUS_CHOICES,
+            'errors': errors or [],
+        })
+
+    def get(self, request, *args, **kwargs):
+        records = self.get_records()
+        rows = []
+        for student_id, name in self.get_roster():
+            _, status, notes = records.get(student_id, (None, 'absent', ''))
+            rows.append({'id': student_id, 'name': name, 'status': status, 'notes': notes})
+        return self.render(rows)
+
+    def post(self, request, *args, **kwargs):
+        valid_statuses = {value for value, _ in STATUS_CHOICES}
+        records = self.get_records()
+        now = timezone.now()
+
+        rows, errors, to_create, to_update = [], [], [], []
+        for student_id, name in self.get_roster():
+            status = request.POST.get(f'status-{student_id}', 'absent')
+            notes = request.POST.get(f'notes-{student_id}', '').strip()
+            rows.append({'id': student_id, 'name': name, 'status': status, 'notes': notes})
+            if status not in valid_statuses:
+                errors.append(f'{name}: недопустимый статус')
+                continue
+
+            if student_id not in records:
+                to_create.append(AttendanceRecord(
+                    repetition=self.repetition,
+                    student_id=student_id,
+                    status=status,
+                    notes=notes,
+                    repetition_date=self.repetition.date,
+                ))
+            elif records[student_id][1:] != (status, notes):
+                to_update.append(AttendanceRecord(
+                    pk=records[student_id][0], student_id=student_id, status=status, notes=notes, updated_at=now
+                ))
+
+        if errors:
+            return self.render(rows, errors)
+
+        with transaction.atomic(), journal_batch(request.user, CHANGE_SOURCE_QUICK):
+            AttendanceRecord.objects.bulk_create(to_create)
+            AttendanceRecord.objects.bulk_update(to_update, ['status', 'notes', 'updated_at'])
+            if to_create or to_update:
+                touch_calendar(self.repetition.group_id, self.repetition.date)
+            for record in to_create:
+                log_change(record.pk, self.repetition.pk, record.student_id, None, record.status, now)
+            for record in to_update:
+                log_change(record.pk, self.repetition.pk, record.student_id, records[record.student_id][1],
+                           record.status, now)
+        # bulk-операции не отправляют сигналы: версию календаря (выше) и подписчиков обновляем явно
+        publish_changes(self.repetition.pk, [
+            record_change(record.student_id, record.status, record.notes)
+            for record in to_create + to_update
+        ])
+        messages.success(request, 'Посещаемость успешно сохранена!')
+        return HttpResponseRedirect(reverse('attendance:repetition_list', kwargs={'pk': self.repetition.group_id}))
+
+
+class AttendanceEventsView(View):
+    """Поток Server-Sent Events с изменениями посещаемости занятия.
+
+    Каждое событие attendance содержит JSON {"changes": [{"student", "status",
+    "notes"}, ...]}; страницы отметки применяют его к своим строкам. Поток
+    обслуживается только под ASGI (отдельный сервис events): под WSGI он занял бы
+    воркер навсегда, поэтому там возвращается 204, и EventSource не переподключается."""
+
+    keepalive = 20
+
+    async def get(self, request, pk):
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+        if not await Repetition.objects.filter(pk=pk).aexists():
+            raise Http404('Занятие не найдено')
+
+        response = StreamingHttpResponse(self.stream(pk), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def stream(self, repetition_id):
+        broker = get_broker()
+        queue = broker.subscribe(repetition_id)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'event: attendance\ndata: {message}\n\n'
+        finally:
+            broker.unsubscribe(repetition_id, queue)
+
+
+class CalendarView(ReportingViewMixin, TemplateView):
     template_name = 'attendance/calendar.html'
 
     def get_context_data(self, **kwargs):
@@ -260,27 +450,10 @@ class CalendarView(TemplateView):
         # Годы для выпадающего списка (текущий год ±5 лет)
         years = range(today.year - 5, today.year + 6)
 
-        # Получаем репетиции за выбранный месяц
-        repetitions = Repetition.objects.filter(
-            group=group,
-            date__year=year,
-            date__month=month
-        ).order_by('date')
-
-        # Получаем участников и их посещаемость
-        students = Student.objects.filter(group=group).order_by('last_name', 'first_name')
-
-        calendar_data = []
-        for student in students:
-            attendance = {
-                rep.date: rep.attendance_records.filter(student=student).first().status
-                if rep.attendance_records.filter(student=student).exists() else None
-                for rep in repetitions
-            }
-            calendar_data.append({
-                'student': student,
-                'attendance': attendance
-            })
+        # Матрица посещаемости берется из кеша (при промахе строится тремя запросами),
+        # соседние месяцы прогреваются в фоне для навигации «назад/вперед»
+        calendar = get_calendar_matrix(group.pk, year, month, today)
+        prefetch_adjacent_months(group.pk, year, month, today)
 
         context.update({
             'group': group,
@@ -296,7 +469,145 @@ class CalendarView(TemplateView):
             ],
             'current_year': year,
             'current_month': month,
-            'repetitions': repetitions,
-            'calendar_data': calendar_data
+            'calendar': calendar
+        })
+        return context
+
+
+class StudentHistoryMixin(ReportingViewMixin):
+    """Общая часть страницы и JSON истории участника"""
+
+    def dispatch(self, request, *args, **kwargs):
+        self.student = get_object_or_404(Student.objects.select_related('group'), pk=kwargs['pk'])
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_history_page(self):
+        try:
+            limit = min(int(self.request.GET.get('limit', HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+        except ValueError:
+            limit = HISTORY_PAGE_SIZE
+        return history_page(self.student.pk, self.request.GET.get('cursor'), max(limit, 1))
+
+
+class StudentHistoryView(StudentHistoryMixin, TemplateView):
+    """История посещаемости участника: занятия от новых к старым с нарастающим процентом"""
+
+    template_name = 'attendance/student_history.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        rows, next_cursor, summary = self.get_history_page()
+        context.update({
+            'student': self.student,
+            'rows': rows,
+            'next_cursor': next_cursor,
+            'summary': summary,
+            'is_first_page': not self.request.GET.get('cursor'),
         })
         return context
+
+
+class StudentHistoryJsonView(StudentHistoryMixin, View):
+    """История посещаемости участника в JSON.
+
+    Следующая страница - ?cursor=<next> из ответа; summary есть только в первой странице."""
+
+    def get(self, request, *args, **kwargs):
+        rows, next_cursor, summary = self.get_history_page()
+        for row in rows:
+            row['date'] = row['date'].isoformat()
+            row['start_time'] = row['start_time'].strftime('%H:%M')
+        return JsonResponse({
+            'student': {'id': self.student.pk, 'name': self.student.full_name},
+            'summary': summary,
+            'results': rows,
+            'next': next_cursor,
+        }, json_dumps_params={'ensure_ascii': False})
+
+
+class ScheduleFeedView(ReportingViewMixin, View):
+    """Лента расписания репетиций в формате iCalendar.
+
+    Неизменившаяся лента отдается ответом 304 по ETag/Last-Modified, изменившаяся -
+    из кеша, а при промахе рендерится потоково и попутно кешируется."""
+
+    feed_kind = None
+
+    def get_repetitions(self):
+        raise NotImplementedError
+
+    def get_calendar_name(self):
+        raise NotImplementedError
+
+    def get_group_names(self):
+        """Названия групп, которые попадают в SUMMARY событий"""
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        repetitions = self.get_repetitions().filter(date__gte=feed_window_start())
+        last_modified, etag = feed_version(repetitions, [self.get_calendar_name(), *self.get_group_names()])
+        headers = {'ETag': quote_etag(etag)}
+        if last_modified:
+            headers['Last-Modified'] = http_date(last_modified.timestamp())
+
+        not_modified = get_conditional_response(
+            request,
+            etag=headers['ETag'],
+            last_modified=int(last_modified.timestamp()) if last_modified else None,
+        )
+        if not_modified is not None:
+            response = not_modified
+        else:
+            key = cache_key(self.feed_kind, kwargs['pk'], etag)
+            body = cache.get(key)
+            if body is not None:
+                response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+            else:
+                repetitions = repetitions.select_related('group').only(
+                    'date', 'start_time', 'duration', 'notes', 'updated_at',
+                    'group__age_category', 'group__year', 'group__gender'
+                ).order_by('date', 'start_time')
+                chunks = iter_calendar(self.get_calendar_name(), repetitions, settings.ICAL_UID_DOMAIN)
+                response = StreamingHttpResponse(
+                    caching_stream(key, chunks), content_type='text/calendar; charset=utf-8'
+                )
+            response['Content-Disposition'] = f'inline; filename="{self.feed_kind}-{kwargs["pk"]}.ics"'
+
+        for header, value in headers.items():
+            response[header] = value
+        # Клиент перепроверяет ленту условным запросом, а не берет копию вслепую
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class GroupScheduleFeedView(ScheduleFeedView):
+    """Расписание репетиций группы"""
+
+    feed_kind = 'group'
+
+    def get_repetitions(self):
+        self.group = get_object_or_404(Group, pk=self.kwargs['pk'])
+        return Repetition.objects.filter(group=self.group)
+
+    def get_calendar_name(self):
+        return f'Репетиции: {self.group}'
+
+    def get_group_names(self):
+        return [str(self.group)]
+
+
+class TeacherScheduleFeedView(ScheduleFeedView):
+    """Расписание репетиций всех групп педагога"""
+
+    feed_kind = 'teacher'
+
+    def get_repetitions(self):
+        teachers = get_user_model().objects.filter(teaching_groups__isnull=False).distinct()
+        self.teacher = get_object_or_404(teachers, pk=self.kwargs['pk'])
+        return Repetition.objects.filter(group__teachers=self.teacher)
+
+    def get_calendar_name(self):
+        return f'Репетиции: {self.teacher.get_full_name() or self.teacher}'
+
+    def get_group_names(self):
+        return sorted(str(group) for group in Group.objects.filter(teachers=self.teacher))
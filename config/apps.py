@@ -0,0 +1,25 @@
+from django.contrib.staticfiles.apps import StaticFilesConfig as BaseStaticFilesConfig
+
+
+class StaticFilesConfig(BaseStaticFilesConfig):
+    """Конфигурация staticfiles, которая не собирает неиспользуемые варианты Bootstrap.
+
+    Шаблоны подключают только css/bootstrap.min.css и js/bootstrap.bundle.min.js (с их
+    .map), поэтому grid/reboot/utilities, RTL, ESM и неминифицированные сборки
+    в STATIC_ROOT не копируются и не хешируются."""
+
+    ignore_patterns = BaseStaticFilesConfig.ignore_patterns + [
+        'bootstrap-grid*',
+        'bootstrap-reboot*',
+        'bootstrap-utilities*',
+        'bootstrap.rtl*',
+        'bootstrap.css',
+        'bootstrap.css.map',
+        'bootstrap.esm*',
+        'bootstrap.js',
+        'bootstrap.js.map',
+        'bootstrap.min.js',
+        'bootstrap.min.js.map',
+        'bootstrap.bundle.js',
+        'bootstrap.bundle.js.map',
+    ]
@@ -0,0 +1,132 @@
+"""Маршрутизация чтения отчетов на реплику.
+
+Тяжелые читающие страницы и команды (главная со статистикой, календарь, выгрузки)
+выполняются внутри use_reporting() - их SELECT уходят на псевдоним reporting, а
+отметка посещаемости и прочие записи остаются на default и не конкурируют с отчетами.
+Вне use_reporting() все запросы идут в default, как и раньше.
+
+Реплика отстает от основной базы, поэтому пользователь, который только что что-то
+записал, читает из default:
+    - до конца текущего запроса после первой записи;
+    - REPORTING_STICKY_SECONDS секунд после запроса с записью (cookie, которую ставит
+      StickyPrimaryMiddleware);
+    - внутри transaction.atomic() на default, где реплика не видит незафиксированных
+      изменений."""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPORTING_DB = 'reporting'
+STICKY_COOKIE = 'db_primary'
+
+_reporting = ContextVar('db_reporting', default=False)
+# Состояние текущего запроса: {'pinned': bool, 'wrote': bool}. Словарь изменяется на месте,
+# чтобы запись из кода, выполняемого в копии контекста (sync_to_async), была видна middleware
+_request_state = ContextVar('db_request_state', default=None)
+
+
+@contextmanager
+def use_reporting():
+    """Читать из реплики отчетов внутри блока (если пользователь не закреплен за default)"""
+
+    token = _reporting.set(True)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+def reads_primary():
+    """Нужно ли сейчас читать из основной базы, даже внутри use_reporting()"""
+
+    state = _request_state.get()
+    if state is not None and (state['pinned'] or state['wrote']):
+        return True
+    return connections[DEFAULT_DB_ALIAS].in_atomic_block
+
+
+class ReportingRouter:
+    """Чтение в use_reporting() - из reporting, все остальное - из default"""
+
+    def db_for_read(self, model, **hints):
+        if _reporting.get() and not reads_primary():
+            return REPORTING_DB
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Обе базы содержат одни и те же данные
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплика получает схему репликацией, а не миграциями
+        return db != REPORTING_DB
+
+
+def reporting_stream(content):
+    """Тело потокового ответа, каждый кусок которого формируется в use_reporting()"""
+
+    iterator = iter(content)
+    while True:
+        with use_reporting():
+            chunk = next(iterator, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+class ReportingViewMixin:
+    """Выполняет обработку запроса представления в use_reporting().
+
+    TemplateResponse рендерится здесь же, а не после возврата из dispatch: ленивые
+    queryset'ы контекста вычисляются в шаблоне и тоже должны читать из реплики.
+    Тело потокового ответа генерируется уже после dispatch, поэтому каждый его кусок
+    тоже формируется в use_reporting().
+
+    Подходит только для читающих представлений: запись (например, POST) все равно
+    уйдет в default и закрепит пользователя за основной базой."""
+
+    def dispatch(self, request, *args, **kwargs):
+        # Сессия и пользователь ленивые (их читает шаблон): загружаем их из основной базы заранее
+        if hasattr(request, 'user'):
+            request.user.is_authenticated
+        with use_reporting():
+            response = super().dispatch(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        if response.streaming and not response.is_async:
+            response.streaming_content = reporting_stream(response.streaming_content)
+        return response
+
+
+class StickyPrimaryMiddleware:
+    """Закрепляет за основной базой пользователя, который недавно что-то записал.
+
+    Должен стоять последним: записи в сессию и журналы мониторинга, которые делают
+    внешние middleware после ответа, пользователя не закрепляют."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sticky_seconds = settings.REPORTING_STICKY_SECONDS
+
+    def __call__(self, request):
+        state = {'pinned': STICKY_COOKIE in request.COOKIES, 'wrote': False}
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+        if state['wrote']:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=self.sticky_seconds, httponly=True, samesite='Lax'
+            )
+        return response
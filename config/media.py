@@ -0,0 +1,48 @@
+import mimetypes
+import posixpath
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.http import content_disposition_header
+
+
+def is_protected_media(name):
+    """Проверяет, что путь лежит в одном из защищенных каталогов MEDIA_ROOT"""
+
+    return any(name.startswith(prefix) for prefix in settings.PROTECTED_MEDIA_PREFIXES)
+
+
+def protected_file_response(name, as_attachment=False, filename=None):
+    """Ответ с файлом из MEDIA_ROOT, права на который уже проверены в Django.
+
+    За nginx (USE_X_ACCEL_REDIRECT=True) возвращается пустой ответ с заголовком
+    X-Accel-Redirect: файл читает и отдает сам nginx из internal-локации, а воркер
+    gunicorn освобождается сразу. Без nginx (локальная разработка) файл отдается
+    через FileResponse.
+
+        Аргументы:
+            name (str): Путь к файлу относительно MEDIA_ROOT
+            as_attachment (bool): Отдать как вложение (Content-Disposition: attachment)
+            filename (str, optional): Имя файла для сохранения у пользователя
+
+        Исключения:
+            Http404: Если путь выходит за пределы MEDIA_ROOT или файла нет"""
+
+    name = posixpath.normpath(name).lstrip('/')
+    if name.startswith('..') or not default_storage.exists(name):
+        raise Http404('Файл не найден')
+
+    filename = filename or posixpath.basename(name)
+    if not settings.USE_X_ACCEL_REDIRECT:
+        return FileResponse(default_storage.open(name, 'rb'), as_attachment=as_attachment, filename=filename)
+
+    response = HttpResponse()
+    response['X-Accel-Redirect'] = settings.PROTECTED_MEDIA_INTERNAL_URL + quote(name)
+    content_type, encoding = mimetypes.guess_type(filename)
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    # Файл доступен только авторизованным: не даем класть его в общие кеши
+    response['Cache-Control'] = 'private, max-age=3600'
+    return response
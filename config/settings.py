@@ -1,5 +1,6 @@
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 import os
 
@@ -28,9 +29,26 @@ STATIC_URL = '/static/'
 STATIC_ROOT = '/app/staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
+# Хеши в именах файлов (manifest) + заранее сжатые .gz/.br копии для nginx gzip_static.
+# Неиспользуемые варианты Bootstrap отсекаются в config.apps.StaticFilesConfig
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'config.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/app/media/'
 
+# Каталоги MEDIA_ROOT, доступные только авторизованным пользователям. Права проверяет
+# Django, а файл отдает nginx из internal-локации PROTECTED_MEDIA_INTERNAL_URL
+PROTECTED_MEDIA_PREFIXES = ['participants/', 'exports/']
+PROTECTED_MEDIA_INTERNAL_URL = '/protected-media/'
+USE_X_ACCEL_REDIRECT = os.getenv('USE_X_ACCEL_REDIRECT', str(not DEBUG)) == 'True'
+
 # === База данных ===
 DATABASES = {
     'default': {
@@ -47,6 +65,23 @@ DATABASES = {
     }
 }
 
+# Реплика для отчетов, выгрузок и календаря (см. config/db_router.py). Без REPORTING_DB_HOST
+# псевдоним reporting подключается к той же базе, что и default. В тестах reporting
+# зеркалирует тестовую базу default, поэтому вторая база не создается
+DATABASES['reporting'] = {
+    **DATABASES['default'],
+    'HOST': os.getenv('REPORTING_DB_HOST', DATABASES['default']['HOST']),
+    'PORT': os.getenv('REPORTING_DB_PORT', DATABASES['default']['PORT']),
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_ROUTERS = ['config.db_router.ReportingRouter']
+# Сколько секунд после своей записи пользователь читает только из основной базы
+# (должно перекрывать отставание реплики)
+REPORTING_STICKY_SECONDS = int(os.getenv('REPORTING_STICKY_SECONDS', '15'))
+
+# Секционирование посещаемости по учебным годам (PostgreSQL, см. attendance/partitions.py)
+ATTENDANCE_PARTITIONING = os.getenv('ATTENDANCE_PARTITIONING') == 'True'
+
 # === Приложения и middleware ===
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -54,11 +89,12 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
-    'django.contrib.staticfiles',
+    'config.apps.StaticFilesConfig',
     'phonenumber_field',
     'users',
     'students',
     'attendance',
+    'monitoring',
 ]
 
 MIDDLEWARE = [
@@ -69,6 +105,9 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'monitoring.middleware.SlowQueryMiddleware',
+    'monitoring.middleware.ProfilingMiddleware',
+    'config.db_router.StickyPrimaryMiddleware',
 ]
 
 # === Шаблоны ===
@@ -76,7 +115,6 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -84,6 +122,14 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            # Скомпилированные шаблоны хранятся в памяти процесса. В режиме DEBUG кеш
+            # сбрасывается автоперезагрузчиком при изменении файла шаблона
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -113,7 +159,97 @@ TIME_ZONE = 'Europe/Moscow'
 USE_I18N = True
 USE_TZ = True
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
+
+# === Кеш, сессии и сообщения ===
+# Локальный кеш процесса; для общего кеша всех воркеров задайте, например,
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache и CACHE_LOCATION=redis://redis:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'kovylek'),
+    }
+}
+# Общий ли кеш для всех воркеров gunicorn: локальный кеш у каждого процесса свой
+CACHE_IS_SHARED = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# SESSION_BACKEND: db (по умолчанию) - стандартное хранение в БД; cached_db - чтение сессии
+# из кеша, запись в БД только при изменении сессии (вход/выход), только с общим кешем:
+# в кеше процесса выход пользователя удалил бы сессию лишь в одном воркере;
+# signed_cookies - сессия целиком в подписанной cookie, таблица django_session не используется
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'db': 'django.contrib.sessions.backends.db',
+}
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'db')
+if SESSION_BACKEND == 'cached_db' and not CACHE_IS_SHARED:
+    raise ImproperlyConfigured('SESSION_BACKEND=cached_db требует общего кеша (CACHE_BACKEND), например Redis')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_BACKEND]
+SESSION_COOKIE_HTTPONLY = True
+
+# Флеш-сообщения живут в cookie до следующего запроса и не изменяют сессию
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
+# Календарь посещаемости: матрицы открытых месяцев живут CALENDAR_CACHE_TIMEOUT секунд,
+# закрытых (закончившихся больше CALENDAR_CLOSED_AFTER_DAYS дней назад) - бессрочно,
+# если кеш общий (CACHE_IS_SHARED);
+# CALENDAR_PREFETCH включает фоновый прогрев соседних месяцев
+CALENDAR_CACHE_TIMEOUT = 600
+CALENDAR_CLOSED_AFTER_DAYS = 7
+CALENDAR_PREFETCH = os.getenv('CALENDAR_PREFETCH', 'True') == 'True'
+
+# Ленты расписания iCalendar: прошедшие занятия за ICAL_PAST_DAYS дней; готовая лента
+# хранится в кеше под ключом с версией расписания, поэтому срок только освобождает память
+ICAL_PAST_DAYS = 90
+ICAL_CACHE_TIMEOUT = 60 * 60 * 24
+ICAL_UID_DOMAIN = BASE_DOMAINS[0]
+
+# Поток изменений посещаемости (Server-Sent Events): local - в пределах процесса,
+# postgres - через LISTEN/NOTIFY между воркерами gunicorn и ASGI-сервисом events
+ATTENDANCE_EVENTS_BACKEND = os.getenv('ATTENDANCE_EVENTS_BACKEND', 'local')
+
+# Выгрузка посещаемости для аналитики (команда export_attendance)
+ATTENDANCE_EXPORT_DIR = os.getenv('ATTENDANCE_EXPORT_DIR', str(BASE_DIR / 'exports' / 'attendance'))
+
+# === Почта ===
+# По умолчанию письма печатаются в консоль; для локальной проверки можно сохранять их в файлы
+# (EMAIL_BACKEND=django.core.mail.backends.filebased.EmailBackend), на сервере - smtp
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+EMAIL_FILE_PATH = os.getenv('EMAIL_FILE_PATH', str(BASE_DIR / 'sent_emails'))
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', f'noreply@{BASE_DOMAINS[0]}')
+# Адрес сайта для ссылок в письмах
+SITE_URL = os.getenv('SITE_URL', f'https://{BASE_DOMAINS[0]}')
+
+# Сводка пропусков (команда send_absentee_digest): за последние ABSENTEE_DIGEST_DAYS дней
+# попадают участники с ABSENTEE_STREAK пропусками подряд или посещаемостью ниже
+# ABSENTEE_RATE% (если отметок не меньше ABSENTEE_MIN_RECORDS); письма уходят пачками
+# по ABSENTEE_DIGEST_BATCH через одно соединение
+ABSENTEE_DIGEST_DAYS = 28
+ABSENTEE_STREAK = 3
+ABSENTEE_RATE = 60
+ABSENTEE_MIN_RECORDS = 4
+ABSENTEE_DIGEST_BATCH = 50
+
+# === Профилирование запросов ===
+# Сотрудники профилируют страницу, добавив к адресу ?_profile; кроме того, можно
+# профилировать сэмплированием случайную долю всех запросов (0.001 = 0,1%)
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_SAMPLE_INTERVAL = 0.005  # секунд между снимками стека
+PROFILING_KEEP = 200  # сколько последних профилей хранить
+
+# === Журнал медленных запросов ===
+SLOW_QUERY_LOG = os.getenv('SLOW_QUERY_LOG', 'True') == 'True'
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '100'))
+SLOW_QUERY_EXPLAIN_RATE = 0.1  # доля повторных попаданий, для которых план обновляется
+SLOW_QUERY_BUFFER_SIZE = 50  # больше медленных запросов за один запрос не сохраняется
 
 # === Оптимизация ===
 ADMIN_LIST_PER_PAGE = 50
@@ -124,6 +260,7 @@ ADMIN_QUICK_EDIT = True
 DATE_INPUT_FORMATS = ['%d-%m-%Y', '%Y-%m-%d']
 DATE_FORMAT = 'd-m-Y'
 
+LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = '/'  # Куда перенаправлять после успешного входа
 LOGOUT_REDIRECT_URL = 'students:main'  # Куда перенаправлять после выхода
 
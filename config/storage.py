@@ -0,0 +1,53 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него создаются только .gz
+    brotli = None
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хранилище статики с хешами в именах файлов и предварительным сжатием.
+
+    После того как ManifestStaticFilesStorage переименует файлы (bootstrap.min.css ->
+    bootstrap.min.8f2c1a9e4b7d.css), рядом с каждым текстовым файлом сохраняются
+    .gz и, если установлен пакет brotli, .br версии. Nginx отдает их напрямую через
+    gzip_static/brotli_static, не сжимая файлы на каждом запросе."""
+
+    compress_extensions = ('.css', '.js', '.map', '.svg', '.ico', '.json', '.webmanifest', '.txt')
+    # Маленькие файлы сжимать нет смысла: заголовки съедят выигрыш
+    min_compress_size = 512
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed_names = []
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                hashed_names.append(hashed_name)
+            yield name, hashed_name, processed
+
+        if dry_run:
+            return
+        for hashed_name in hashed_names:
+            if hashed_name.endswith(self.compress_extensions):
+                self._compress(hashed_name)
+
+    def _compress(self, name):
+        with self.open(name) as original:
+            content = original.read()
+        if len(content) < self.min_compress_size:
+            return
+
+        variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(content, quality=11)))
+
+        for suffix, compressed in variants:
+            # Сжатая версия, которая почти не меньше оригинала, только лишний раз читается с диска
+            if len(compressed) >= len(content) * 0.95:
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
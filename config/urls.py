@@ -1,8 +1,11 @@
+import re
+
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf.urls.static import static
 
 from config import settings
+from students.views import ProtectedMediaView
 
 urlpatterns = [
     # Админка
@@ -12,6 +15,16 @@ urlpatterns = [
     path('attendance/', include('attendance.urls', namespace='attendance')),
     path('', include('students.urls', namespace='students')),
     path('users/', include('users.urls', namespace='users')),
+
+    # Защищенные медиафайлы: авторизация в Django, отдача через nginx (X-Accel-Redirect)
+    re_path(
+        r'^%s(?P<path>(?:%s).+)$' % (
+            re.escape(settings.MEDIA_URL.lstrip('/')),
+            '|'.join(re.escape(prefix) for prefix in settings.PROTECTED_MEDIA_PREFIXES),
+        ),
+        ProtectedMediaView.as_view(),
+        name='protected_media'
+    ),
 ]
 
 if settings.DEBUG:
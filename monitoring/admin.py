@@ -0,0 +1,111 @@
+from django.contrib import admin
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from monitoring.models import RequestProfile, SlowQuery
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Профили запросов: просмотр и выгрузка (только для чтения)"""
+
+    list_display = ('url_name', 'method', 'status_code', 'duration_ms', 'mode', 'samples', 'user', 'created_at',
+                    'downloads')
+    list_filter = ('mode', 'url_name', 'method')
+    search_fields = ('url_name', 'path')
+    date_hierarchy = 'created_at'
+    list_select_related = ('user',)
+    fields = ('url_name', 'path', 'method', 'status_code', 'user', 'mode', 'duration_ms', 'samples', 'created_at',
+              'downloads', 'summary')
+    readonly_fields = fields
+
+    def get_queryset(self, request):
+        # Сами профили в списке не нужны, а весят сотни килобайт
+        return super().get_queryset(request).defer('pstats_data', 'collapsed_stacks')
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/pstats/', self.admin_site.admin_view(self.download_pstats),
+                 name='monitoring_requestprofile_pstats'),
+            path('<int:pk>/flamegraph/', self.admin_site.admin_view(self.download_flamegraph),
+                 name='monitoring_requestprofile_flamegraph'),
+        ] + super().get_urls()
+
+    def downloads(self, obj):
+        links = []
+        if obj.mode == RequestProfile.MODE_DETERMINISTIC:
+            links.append(format_html('<a href="{}">pstats</a>',
+                                     reverse('admin:monitoring_requestprofile_pstats', args=[obj.pk])))
+        links.append(format_html('<a href="{}">flamegraph</a>',
+                                 reverse('admin:monitoring_requestprofile_flamegraph', args=[obj.pk])))
+        return format_html(' | '.join(['{}'] * len(links)), *links)
+
+    downloads.short_description = 'Скачать'
+
+    def summary(self, obj):
+        text = obj.stats_summary()
+        return format_html('<pre style="font-size: 0.75rem">{}</pre>', text) if text else '-'
+
+    summary.short_description = 'pstats (по суммарному времени)'
+
+    def _file_response(self, content, content_type, filename):
+        response = HttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def download_pstats(self, request, pk):
+        """Файл для pstats.Stats / snakeviz"""
+
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        if not profile.pstats_data:
+            raise Http404('Для этого запроса профиль cProfile не снимался')
+        return self._file_response(bytes(profile.pstats_data), 'application/octet-stream',
+                                   f'profile-{profile.pk}.prof')
+
+    def download_flamegraph(self, request, pk):
+        """Свернутые стеки для flamegraph.pl или speedscope"""
+
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        return self._file_response(profile.collapsed_stacks, 'text/plain; charset=utf-8',
+                                   f'profile-{profile.pk}.collapsed.txt')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Журнал медленных запросов (только для чтения)"""
+
+    list_display = ('short_sql', 'calls', 'total_ms', 'avg_ms', 'max_ms', 'database', 'url_name', 'last_seen')
+    list_filter = ('database', 'url_name')
+    search_fields = ('normalized_sql',)
+    fields = ('normalized_sql', 'sample_sql', 'sample_params', 'database', 'url_name', 'calls', 'total_ms', 'max_ms',
+              'first_seen', 'last_seen', 'plan_display', 'plan_at')
+    readonly_fields = fields
+
+    def short_sql(self, obj):
+        return obj.normalized_sql[:120]
+
+    short_sql.short_description = 'Запрос'
+
+    def avg_ms(self, obj):
+        return round(obj.avg_ms, 1)
+
+    avg_ms.short_description = 'Среднее, мс'
+
+    def plan_display(self, obj):
+        return format_html('<pre>{}</pre>', obj.plan) if obj.plan else '-'
+
+    plan_display.short_description = 'План (EXPLAIN)'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
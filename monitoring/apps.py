@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'monitoring'
+    verbose_name = 'Мониторинг'
+
+    def ready(self):
+        from django.conf import settings
+        from django.db.backends.signals import connection_created
+
+        from monitoring.slow_queries import install
+
+        if settings.SLOW_QUERY_LOG:
+            connection_created.connect(install, dispatch_uid='monitoring_slow_queries')
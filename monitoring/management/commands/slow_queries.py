@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from config.db_router import use_reporting
+from monitoring.models import SlowQuery
+
+ORDERINGS = {
+    'total': '-total_ms',
+    'max': '-max_ms',
+    'calls': '-calls',
+    'avg': F('total_ms') / F('calls'),
+}
+
+
+class Command(BaseCommand):
+    """Самые тяжелые запросы из журнала медленных запросов:
+        python manage.py slow_queries --top 10 --order avg --plans"""
+
+    help = 'Показывает самые медленные SQL-запросы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20, help='Сколько запросов показать')
+        parser.add_argument('--order', choices=ORDERINGS, default='total',
+                            help='Сортировка: суммарное, максимальное, среднее время или число выполнений')
+        parser.add_argument('--plans', action='store_true', help='Показать планы выполнения')
+        parser.add_argument('--reset', action='store_true', help='Очистить журнал')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'Журнал очищен, удалено записей: {deleted}'))
+            return
+
+        ordering = ORDERINGS[options['order']]
+        if options['order'] == 'avg':
+            ordering = ordering.desc()
+        with use_reporting():
+            queries = list(SlowQuery.objects.order_by(ordering)[:options['top']])
+        for position, query in enumerate(queries, start=1):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'#{position} всего {query.total_ms:.0f} мс, вызовов {query.calls}, '
+                f'среднее {query.avg_ms:.1f} мс, максимум {query.max_ms:.1f} мс '
+                f'[{query.database}, {query.url_name or "-"}]'
+            ))
+            self.stdout.write(query.normalized_sql)
+            if options['plans'] and query.plan:
+                self.stdout.write(self.style.NOTICE(query.plan))
+            self.stdout.write('')
@@ -0,0 +1,98 @@
+import logging
+import random
+
+from django.conf import settings
+
+from monitoring import slow_queries
+from monitoring.models import RequestProfile
+from monitoring.profiling import profile_call
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PARAMETER = '_profile'
+
+
+class ProfilingMiddleware:
+    """Профилирует запрос по требованию сотрудника или для случайной доли запросов.
+
+    Сотрудник (is_staff) добавляет к адресу страницы ?_profile - запрос выполняется
+    под cProfile и сэмплирующим профилировщиком. Кроме того, доля запросов
+    PROFILING_SAMPLE_RATE профилируется только сэмплированием. Если профилирование
+    не запрошено, middleware просто вызывает следующий обработчик.
+
+    Должен стоять после AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.interval = settings.PROFILING_SAMPLE_INTERVAL
+
+    def __call__(self, request):
+        if PROFILE_PARAMETER in request.GET and request.user.is_staff:
+            mode = RequestProfile.MODE_DETERMINISTIC
+        elif self.sample_rate and random.random() < self.sample_rate:
+            mode = RequestProfile.MODE_SAMPLING
+        else:
+            return self.get_response(request)
+
+        response, duration_ms, pstats_data, sampler = profile_call(
+            self.get_response, request,
+            deterministic=mode == RequestProfile.MODE_DETERMINISTIC,
+            interval=self.interval,
+        )
+        try:
+            self.save_profile(request, response, mode, duration_ms, pstats_data, sampler)
+        except Exception:
+            logger.exception('Не удалось сохранить профиль запроса %s', request.path)
+        return response
+
+    @staticmethod
+    def save_profile(request, response, mode, duration_ms, pstats_data, sampler):
+        match = request.resolver_match
+        user = getattr(request, 'user', None)
+        RequestProfile.objects.create(
+            url_name=(match.view_name if match else '') or '-',
+            path=request.get_full_path()[:2000],
+            method=request.method,
+            status_code=response.status_code,
+            user=user if user is not None and user.is_authenticated else None,
+            mode=RequestProfile.MODE_DETERMINISTIC if pstats_data else RequestProfile.MODE_SAMPLING,
+            duration_ms=duration_ms,
+            samples=sum(sampler.stacks.values()),
+            pstats_data=pstats_data,
+            collapsed_stacks=sampler.collapsed(),
+        )
+
+        # Храним только последние PROFILING_KEEP профилей
+        keep = settings.PROFILING_KEEP
+        stale_ids = list(RequestProfile.objects.order_by('-pk').values_list('pk', flat=True)[keep:keep + 100])
+        if stale_ids:
+            RequestProfile.objects.filter(pk__in=stale_ids).delete()
+
+
+class SlowQueryMiddleware:
+    """Сохраняет медленные запросы, накопленные за время обработки запроса.
+
+    У потокового ответа сбор продолжается, пока тело отдается клиенту, и запросы
+    генератора тела (например, iCal-ленты) сохраняются с именем его представления."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        slow_queries.start()
+        response = self.get_response(request)
+        match = request.resolver_match
+        url_name = match.view_name if match else ''
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.flush_after(response.streaming_content, url_name)
+        else:
+            slow_queries.flush(url_name)
+        return response
+
+    @staticmethod
+    def flush_after(content, url_name):
+        try:
+            yield from content
+        finally:
+            slow_queries.flush(url_name)
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.5 on 2026-10-19 03:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_name', models.CharField(db_index=True, max_length=200, verbose_name='Имя URL')),
+                ('path', models.CharField(max_length=2000, verbose_name='Путь')),
+                ('method', models.CharField(max_length=10, verbose_name='Метод')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('mode', models.CharField(choices=[('cprofile', 'cProfile + сэмплирование'), ('sampling', 'Сэмплирование')], max_length=10, verbose_name='Режим')),
+                ('duration_ms', models.FloatField(verbose_name='Длительность, мс')),
+                ('samples', models.PositiveIntegerField(default=0, verbose_name='Сэмплов')),
+                ('pstats_data', models.BinaryField(blank=True, null=True, verbose_name='Данные pstats')),
+                ('collapsed_stacks', models.TextField(blank=True, verbose_name='Свернутые стеки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Создан')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
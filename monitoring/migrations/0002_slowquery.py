@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40, unique=True, verbose_name='Отпечаток')),
+                ('normalized_sql', models.TextField(verbose_name='Запрос')),
+                ('sample_sql', models.TextField(verbose_name='Пример запроса')),
+                ('sample_params', models.TextField(blank=True, verbose_name='Параметры примера')),
+                ('database', models.CharField(max_length=50, verbose_name='База данных')),
+                ('url_name', models.CharField(blank=True, max_length=200, verbose_name='Последнее представление')),
+                ('calls', models.PositiveIntegerField(default=1, verbose_name='Выполнений')),
+                ('total_ms', models.FloatField(verbose_name='Суммарно, мс')),
+                ('max_ms', models.FloatField(verbose_name='Максимум, мс')),
+                ('plan', models.TextField(blank=True, verbose_name='План (EXPLAIN)')),
+                ('plan_at', models.DateTimeField(blank=True, null=True, verbose_name='План получен')),
+                ('first_seen', models.DateTimeField(auto_now_add=True, verbose_name='Впервые')),
+                ('last_seen', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Последний раз')),
+            ],
+            options={
+                'verbose_name': 'Медленный запрос',
+                'verbose_name_plural': 'Медленные запросы',
+                'ordering': ['-total_ms'],
+            },
+        ),
+    ]
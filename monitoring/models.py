@@ -0,0 +1,92 @@
+import marshal
+import pstats
+from io import StringIO
+
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """Профиль выполнения одного запроса"""
+
+    MODE_DETERMINISTIC = 'cprofile'
+    MODE_SAMPLING = 'sampling'
+    MODE_CHOICES = [
+        (MODE_DETERMINISTIC, 'cProfile + сэмплирование'),
+        (MODE_SAMPLING, 'Сэмплирование'),
+    ]
+
+    url_name = models.CharField(max_length=200, db_index=True, verbose_name='Имя URL')
+    path = models.CharField(max_length=2000, verbose_name='Путь')
+    method = models.CharField(max_length=10, verbose_name='Метод')
+    status_code = models.PositiveSmallIntegerField(verbose_name='Код ответа')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name='Пользователь'
+    )
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, verbose_name='Режим')
+    duration_ms = models.FloatField(verbose_name='Длительность, мс')
+    samples = models.PositiveIntegerField(default=0, verbose_name='Сэмплов')
+    pstats_data = models.BinaryField(null=True, blank=True, verbose_name='Данные pstats')
+    collapsed_stacks = models.TextField(blank=True, verbose_name='Свернутые стеки')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Создан')
+
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.url_name} {self.duration_ms:.0f} мс ({self.created_at:%d.%m.%Y %H:%M})"
+
+    def stats_summary(self, limit=30):
+        """Текстовый отчет pstats: самые дорогие функции по суммарному времени"""
+
+        if not self.pstats_data:
+            return ''
+        stats = pstats.Stats(_MarshalledStats(bytes(self.pstats_data)), stream=StringIO())
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return stats.stream.getvalue()
+
+
+class _MarshalledStats:
+    """Источник для pstats.Stats: данные профиля в формате dump_stats (marshal)"""
+
+    def __init__(self, data):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self):
+        pass
+
+
+class SlowQuery(models.Model):
+    """Медленный SQL-запрос, сгруппированный по отпечатку (SQL без параметров)"""
+
+    fingerprint = models.CharField(max_length=40, unique=True, verbose_name='Отпечаток')
+    normalized_sql = models.TextField(verbose_name='Запрос')
+    sample_sql = models.TextField(verbose_name='Пример запроса')
+    sample_params = models.TextField(blank=True, verbose_name='Параметры примера')
+    database = models.CharField(max_length=50, verbose_name='База данных')
+    url_name = models.CharField(max_length=200, blank=True, verbose_name='Последнее представление')
+    calls = models.PositiveIntegerField(default=1, verbose_name='Выполнений')
+    total_ms = models.FloatField(verbose_name='Суммарно, мс')
+    max_ms = models.FloatField(verbose_name='Максимум, мс')
+    plan = models.TextField(blank=True, verbose_name='План (EXPLAIN)')
+    plan_at = models.DateTimeField(null=True, blank=True, verbose_name='План получен')
+    first_seen = models.DateTimeField(auto_now_add=True, verbose_name='Впервые')
+    last_seen = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Последний раз')
+
+    class Meta:
+        verbose_name = 'Медленный запрос'
+        verbose_name_plural = 'Медленные запросы'
+        ordering = ['-total_ms']
+
+    def __str__(self):
+        return self.normalized_sql[:100]
+
+    @property
+    def avg_ms(self):
+        return self.total_ms / self.calls if self.calls else 0
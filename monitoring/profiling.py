@@ -0,0 +1,96 @@
+"""Профилирование отдельных запросов.
+
+Детерминированный профиль снимает cProfile, а для flamegraph параллельно работает
+сэмплирующий поток: он с заданным интервалом читает стек потока запроса
+(sys._current_frames) и считает одинаковые стеки. Результат сохраняется в формате
+«свернутых стеков» (frame;frame;frame count), который понимают flamegraph.pl,
+speedscope и inferno."""
+
+import cProfile
+import marshal
+import sys
+import threading
+import time
+from collections import Counter
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}:{code.co_qualname}"
+
+
+class StackSampler:
+    """Сэмплирующий профилировщик одного потока"""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def collapsed(self):
+        """Свернутые стеки, по одному на строку"""
+
+        return '\n'.join(f'{stack} {count}' for stack, count in self.stacks.most_common())
+
+
+# cProfile в Python 3.12+ может быть активен только в одном потоке процесса
+_deterministic_lock = threading.Lock()
+
+
+def profile_call(func, *args, deterministic=False, interval=0.005):
+    """Выполняет func(*args) под профилировщиком.
+
+        Аргументы:
+            func (callable): Профилируемый вызов
+            deterministic (bool): Дополнительно снять профиль cProfile. Если cProfile уже
+                занят другим потоком, снимается только сэмплирующий профиль
+            interval (float): Интервал сэмплирования, секунд
+
+        Возвращает:
+            tuple: (результат func, длительность в мс, данные pstats или None, StackSampler)"""
+
+    profiler = None
+    if deterministic and _deterministic_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+
+    sampler = StackSampler(threading.get_ident(), interval)
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        try:
+            result = func(*args)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        sampler.stop()
+        if profiler is not None:
+            _deterministic_lock.release()
+
+    pstats_data = None
+    if profiler is not None:
+        profiler.create_stats()
+        pstats_data = marshal.dumps(profiler.stats)
+    return result, duration_ms, pstats_data, sampler
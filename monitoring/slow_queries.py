@@ -0,0 +1,165 @@
+"""Журнал медленных SQL-запросов.
+
+Обертка execute_wrappers засекает время каждого запроса и складывает те, что дольше
+SLOW_QUERY_THRESHOLD_MS, в буфер текущего потока - но только внутри сбора, открытого
+start(): SlowQueryMiddleware открывает его на время запроса, фоновый прогрев календаря -
+на время задачи. Вне сбора (команды, прочие потоки) запросы не копятся, а в буфере
+хранится не больше SLOW_QUERY_BUFFER_SIZE запросов. Запись в базу происходит уже после
+ответа (flush), чтобы не вмешиваться в транзакции представления. Запросы группируются
+по отпечатку - SQL, в котором литералы и списки IN заменены на «?», так что одинаковые
+запросы с разными параметрами попадают в одну строку SlowQuery. Для части запросов
+сохраняется план: EXPLAIN в PostgreSQL (без ANALYZE, запрос не выполняется повторно)
+и EXPLAIN QUERY PLAN в SQLite."""
+
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import IntegrityError, connections
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|\?')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """SQL без литералов и параметров: основа отпечатка запроса"""
+
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()
+
+
+def start():
+    """Открывает сбор медленных запросов в текущем потоке (несохраненные прежние отбрасываются)"""
+
+    _local.queries = []
+
+
+def record_slow_queries(execute, sql, params, many, context):
+    """Обертка для connection.execute_wrappers"""
+
+    queries = getattr(_local, 'queries', None)
+    if queries is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms >= settings.SLOW_QUERY_THRESHOLD_MS and len(queries) < settings.SLOW_QUERY_BUFFER_SIZE:
+            queries.append((context['connection'].alias, sql, params, many, duration_ms))
+
+
+def install(sender, connection, **kwargs):
+    """Обработчик сигнала connection_created: подключает обертку к соединению"""
+
+    if record_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_slow_queries)
+
+
+def explain(alias, sql, params, many=False):
+    """План запроса или пустая строка, если СУБД не поддерживается или запрос не SELECT"""
+
+    if many or not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return ''
+    connection = connections[alias]
+    if connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN (ANALYZE off, VERBOSE on) '
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        return ''
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+    except Exception as error:
+        return f'Не удалось получить план: {error}'
+    if connection.vendor == 'sqlite':
+        return '\n'.join(str(row[-1]) for row in rows)
+    return '\n'.join(row[0] for row in rows)
+
+
+def flush(url_name=''):
+    """Закрывает сбор и сохраняет накопленные медленные запросы текущего потока в SlowQuery"""
+
+    queries = getattr(_local, 'queries', None)
+    # Запросы самого сохранения уже вне сбора
+    _local.queries = None
+    if not queries:
+        return
+    try:
+        for alias, sql, params, many, duration_ms in queries:
+            _save(alias, sql, params, many, duration_ms, url_name)
+    except Exception:
+        logger.exception('Не удалось сохранить медленные запросы')
+
+
+@contextmanager
+def collect(url_name):
+    """Сбор медленных запросов блока кода с сохранением под именем url_name"""
+
+    start()
+    try:
+        yield
+    finally:
+        flush(url_name)
+
+
+def _save(alias, sql, params, many, duration_ms, url_name):
+    from monitoring.models import SlowQuery
+
+    normalized = normalize_sql(sql)
+    key = fingerprint(normalized)
+    now = timezone.now()
+    updated = SlowQuery.objects.filter(fingerprint=key).update(
+        calls=F('calls') + 1,
+        total_ms=F('total_ms') + duration_ms,
+        max_ms=Greatest('max_ms', duration_ms),
+        last_seen=now,
+        url_name=url_name,
+    )
+    if updated:
+        if random.random() < settings.SLOW_QUERY_EXPLAIN_RATE:
+            SlowQuery.objects.filter(fingerprint=key).update(
+                sample_sql=sql, sample_params=repr(params), plan=explain(alias, sql, params, many), plan_at=now,
+            )
+        return
+
+    try:
+        SlowQuery.objects.create(
+            fingerprint=key,
+            normalized_sql=normalized,
+            sample_sql=sql,
+            sample_params=repr(params),
+            database=alias,
+            url_name=url_name,
+            total_ms=duration_ms,
+            max_ms=duration_ms,
+            plan=explain(alias, sql, params, many),
+            plan_at=now,
+        )
+    except IntegrityError:
+        # Тот же запрос одновременно сохранил другой воркер
+        SlowQuery.objects.filter(fingerprint=key).update(calls=F('calls') + 1, total_ms=F('total_ms') + duration_ms)
@@ -1,11 +1,14 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.utils.html import format_html
 from phonenumber_field.widgets import PhoneNumberPrefixWidget
 from phonenumber_field.formfields import PhoneNumberField
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
+from attendance.utils import current_academic_year
 from .models import Group, Student
+from .rollover import apply_rollover, describe_plan, plan_rollover
+from .thumbnails import thumbnail_url
 
 @admin.register(Group)
 class GroupAdmin(admin.ModelAdmin):
@@ -13,9 +16,11 @@ class GroupAdmin(admin.ModelAdmin):
     list_filter = ('age_category', 'year', 'gender', 'is_active')
     search_fields = ['age_category', 'year', 'gender']
     list_editable = ('is_active',)
+    filter_horizontal = ('teachers',)
+    actions = ['preview_rollover', 'rollover']
 
     def students_count(self, obj):
-        return obj.students.count()
+        return obj.students.active().count()
     students_count.short_description = 'Количество участников'
 
     def repetitions_count(self, obj):
@@ -26,14 +31,35 @@ class GroupAdmin(admin.ModelAdmin):
 
     def display_image(self, obj):
         if obj.image:
-            return format_html('<img src="{}" width="50" />', obj.image.url)
+            return format_html('<img src="{}" width="50" />', thumbnail_url(obj.image, 320, 'jpg'))
         return "Нет фото"
     display_image.short_description = 'Фото'
 
+    def preview_rollover(self, request, queryset):
+        steps = plan_rollover(current_academic_year(), list(queryset.values_list('pk', flat=True)))
+        if not steps:
+            self.message_user(request, 'Выбранные группы уже переведены на текущий учебный год', messages.WARNING)
+        for line in describe_plan(steps):
+            self.message_user(request, line, messages.INFO)
+    preview_rollover.short_description = 'Показать план перевода на новый учебный год'
+
+    def rollover(self, request, queryset):
+        steps, totals = apply_rollover(current_academic_year(), list(queryset.values_list('pk', flat=True)))
+        if not steps:
+            self.message_user(request, 'Выбранные группы уже переведены на текущий учебный год', messages.WARNING)
+            return
+        self.message_user(
+            request,
+            f'Переведено участников: {totals["promoted"]}, выпущено: {totals["graduated"]}, '
+            f'создано групп: {totals["created"]}, закрыто: {totals["closed"]}',
+            messages.SUCCESS,
+        )
+    rollover.short_description = 'Перевести на новый учебный год'
+
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
-    list_display = ('full_name', 'group', 'birth_date', 'phone', 'photo_preview')
-    list_filter = ('group', 'gender', 'group__age_category')
+    list_display = ('full_name', 'group', 'status', 'birth_date', 'phone', 'photo_preview')
+    list_filter = ('status', 'group', 'gender', 'group__age_category')
     search_fields = ('last_name', 'first_name', 'middle_name', 'phone')
     autocomplete_fields = ['group']
     date_hierarchy = 'birth_date'
@@ -46,7 +72,7 @@ class StudentAdmin(admin.ModelAdmin):
             'fields': (('last_name', 'first_name', 'middle_name'), 'birth_date', 'gender')
         }),
         ('Группа', {
-            'fields': ('group', 'enrollment_date', 'expulsion_date', 'graduation_year')
+            'fields': ('group', 'status', 'enrollment_date', 'expulsion_date', 'graduation_year')
         }),
         ('Контакты', {
             'fields': ('phone', 'photo', 'photo_preview')
@@ -61,7 +87,8 @@ class StudentAdmin(admin.ModelAdmin):
 
     def photo_preview(self, obj):
         if obj.photo:
-            return format_html('<img src="{}" width="100" style="border-radius: 5px;" />', obj.photo.url)
+            return format_html('<img src="{}" width="100" style="border-radius: 5px;" />',
+                               thumbnail_url(obj.photo, 200, 'jpg'))
         return "Нет фото"
     photo_preview.short_description = 'Предпросмотр фото'
 
@@ -12,6 +12,9 @@ AGE_CHOICES = [
     (AGE_KIDS, "Детки"),
 ]
 
+# Порядок перевода групп при смене учебного года: после старшей группы - выпуск
+AGE_TIERS = [AGE_KIDS, AGE_PREPARATORY, AGE_JUNIOR, AGE_MIDDLE, AGE_SENIOR]
+
 GENDER_MALE = "Мальчики"
 GENDER_FEMALE = "Девочки"
 
@@ -20,10 +23,14 @@ GENDER_CHOICES = [
     (GENDER_FEMALE, "Д"),
 ]
 
+STATUS_PARTICIPANT = 'Participant'
+STATUS_GRADUATE = 'Graduate'
+STATUS_EXPELLED = 'Expelled'
+
 STATUS_CHOICES = [
-    ('Participant', 'Участник'),
-    ('Graduate', 'Выпускник'),
-    ('Expelled', 'Отчислен'),
+    (STATUS_PARTICIPANT, 'Участник'),
+    (STATUS_GRADUATE, 'Выпускник'),
+    (STATUS_EXPELLED, 'Отчислен'),
 ]
 
 PROGRAM_CHOICES = [
@@ -31,4 +38,8 @@ PROGRAM_CHOICES = [
     ('DOOP_II', 'ДООП вторая ступень'),
     ('DPOP_5', 'ДПОП 5 лет'),
     ('DPOP_8', 'ДПОП 8 лет'),
-]
\ No newline at end of file
+]
+
+# Ширины превью (px) для фото групп (карточки на главной) и участников (аватары, админка)
+GROUP_IMAGE_WIDTHS = (320, 640, 800)
+STUDENT_PHOTO_WIDTHS = (96, 200)
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.utils import current_academic_year
+from students.rollover import apply_rollover, describe_plan, plan_rollover
+
+
+class Command(BaseCommand):
+    """Перевод групп на новый учебный год.
+
+    Запускать после 1 июня, сначала с --dry-run для проверки плана:
+        python manage.py rollover_groups --dry-run
+        python manage.py rollover_groups"""
+
+    help = 'Переводит группы в следующую возрастную категорию и выпускает старшие группы'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int,
+                            help='Год начала учебного года, на который переводятся группы (по умолчанию - текущий)')
+        parser.add_argument('--group', type=int, action='append', dest='groups',
+                            help='Перевести только группу с этим id (можно указать несколько раз)')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать план перевода')
+
+    def handle(self, *args, **options):
+        academic_year = options['year'] or current_academic_year()
+        if academic_year > current_academic_year():
+            raise CommandError(f'Учебный год {academic_year}/{academic_year + 1} еще не начался')
+
+        if options['dry_run']:
+            steps = plan_rollover(academic_year, options['groups'])
+            for line in describe_plan(steps):
+                self.stdout.write(line)
+            self.stdout.write(f'К переводу на {academic_year}/{academic_year + 1}: групп {len(steps)}')
+            return
+
+        started = time.monotonic()
+        steps, totals = apply_rollover(academic_year, options['groups'])
+        for line in describe_plan(steps):
+            self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(
+            f'Переведено участников {totals["promoted"]}, выпущено {totals["graduated"]}, '
+            f'создано групп {totals["created"]}, закрыто {totals["closed"]} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,19 @@
+from django.db import models
+
+from .constants import STATUS_PARTICIPANT
+
+
+class StudentQuerySet(models.QuerySet):
+    """QuerySet участников с фильтрами по статусу.
+
+    Доступен и через связанный менеджер группы: group.students.active()"""
+
+    def active(self):
+        """Действующие участники: только они попадают в списки группы, формы и календари"""
+
+        return self.filter(status=STATUS_PARTICIPANT)
+
+    def inactive(self):
+        """Выпускники и отчисленные"""
+
+        return self.exclude(status=STATUS_PARTICIPANT)
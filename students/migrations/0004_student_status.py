@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-19 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0003_group_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='student',
+            name='status',
+            field=models.CharField(choices=[('Participant', 'Участник'), ('Graduate', 'Выпускник'), ('Expelled', 'Отчислен')], db_index=True, default='Participant', max_length=20, verbose_name='Статус'),
+        ),
+    ]
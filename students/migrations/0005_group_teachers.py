@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0004_student_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='teachers',
+            field=models.ManyToManyField(blank=True, related_name='teaching_groups', to=settings.AUTH_USER_MODEL, verbose_name='Педагоги'),
+        ),
+    ]
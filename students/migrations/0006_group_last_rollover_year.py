@@ -0,0 +1,19 @@
+# Generated by Django 5.2.5 on 2026-10-19 04:20
+
+import attendance.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0005_group_teachers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='group',
+            name='last_rollover_year',
+            field=models.PositiveSmallIntegerField(default=attendance.utils.current_academic_year, help_text='Год начала учебного года, для которого группа уже в своей возрастной категории. Группы прошлых лет переводит команда rollover_groups', verbose_name='Учебный год группы'),
+        ),
+    ]
@@ -1,8 +1,14 @@
+from django.conf import settings
 from django.db import models
 from phonenumber_field.modelfields import PhoneNumberField
 from django.core.validators import FileExtensionValidator
 
-from .constants import AGE_CHOICES, GENDER_CHOICES
+from attendance.utils import current_academic_year
+
+from .constants import (AGE_CHOICES, GENDER_CHOICES, GROUP_IMAGE_WIDTHS, STATUS_CHOICES, STATUS_PARTICIPANT,
+                        STUDENT_PHOTO_WIDTHS)
+from .managers import StudentQuerySet
+from .thumbnails import generate_thumbnails, stored_file_name
 
 
 
@@ -34,6 +40,18 @@ class Group(models.Model):
         validators=[FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png'])],
         help_text='Рекомендуемый размер: 800x600px'
     )
+    last_rollover_year = models.PositiveSmallIntegerField(
+        'Учебный год группы',
+        default=current_academic_year,
+        help_text='Год начала учебного года, для которого группа уже в своей возрастной категории. '
+                  'Группы прошлых лет переводит команда rollover_groups'
+    )
+    teachers = models.ManyToManyField(
+        settings.AUTH_USER_MODEL,
+        blank=True,
+        related_name='teaching_groups',
+        verbose_name='Педагоги'
+    )
 
     class Meta:
         verbose_name = 'Группа'
@@ -43,6 +61,14 @@ class Group(models.Model):
     def __str__(self):
         return f"{self.get_age_category_display()} {self.year}-{self.get_gender_display()}"
 
+    def save(self, *args, **kwargs):
+        # Превью создаются сразу после загрузки нового файла, чтобы первая страница не ждала Pillow
+        uploaded = bool(self.image) and not self.image._committed
+        previous = stored_file_name(self, 'image') if uploaded else None
+        super().save(*args, **kwargs)
+        if uploaded:
+            generate_thumbnails(self.image, GROUP_IMAGE_WIDTHS, previous)
+
 
 class Student(models.Model):
     """Модель участника с оптимизированной структурой"""
@@ -101,6 +127,13 @@ class Student(models.Model):
         null=True,
         blank=True
     )
+    status = models.CharField(
+        'Статус',
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PARTICIPANT,
+        db_index=True
+    )
     photo = models.ImageField(
         'Фото',
         upload_to='participants/photos/',
@@ -116,6 +149,8 @@ class Student(models.Model):
         auto_now=True
     )
 
+    objects = StudentQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Участник'
         verbose_name_plural = 'Участники'
@@ -124,6 +159,20 @@ class Student(models.Model):
     def __str__(self):
         return self.full_name or f"Участник #{self.id}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Группа на момент загрузки: при переходе меняется версия календаря и прежней группы
+        instance._loaded_group_id = instance.__dict__.get('group_id')
+        return instance
+
+    def save(self, *args, **kwargs):
+        uploaded = bool(self.photo) and not self.photo._committed
+        previous = stored_file_name(self, 'photo') if uploaded else None
+        super().save(*args, **kwargs)
+        if uploaded:
+            generate_thumbnails(self.photo, STUDENT_PHOTO_WIDTHS, previous)
+
     @property
     def full_name(self):
         """Полное имя участника"""
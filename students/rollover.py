@@ -0,0 +1,158 @@
+"""Перевод групп на новый учебный год.
+
+Каждая действующая группа, учебный год которой (Group.last_rollover_year) отстает
+от нового, переходит в следующую возрастную категорию (AGE_TIERS) с тем же годом
+набора и полом; участники старшей группы выпускаются. Прежняя группа закрывается
+и остается с историей занятий, участники переходят в группу следующей категории,
+а педагоги - вместе с ними. Если группа пропустила несколько переводов, она
+сдвигается на столько категорий, сколько лет пропущено.
+
+Перевод выполняется фиксированным числом запросов в одной транзакции независимо от
+числа групп: выпуск - один UPDATE, закрытие групп - один UPDATE, создание групп
+следующей категории - один upsert, переход участников - один UPDATE с CASE,
+перенос педагогов - один INSERT. Переведенные группы отмечаются учебным годом,
+поэтому повторный запуск за тот же год ничего не меняет."""
+
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Case, Count, Q, Value, When
+from django.utils import timezone
+
+from attendance.calendar_cache import touch_calendar
+
+from .constants import AGE_CHOICES, AGE_TIERS, GENDER_CHOICES, STATUS_GRADUATE, STATUS_PARTICIPANT
+from .models import Group, Student
+
+# target - (категория, год набора, пол) группы, куда переходят участники, или None для выпуска
+RolloverStep = namedtuple('RolloverStep', ['group', 'target', 'participants', 'target_exists'])
+
+
+def groups_to_roll(academic_year, group_ids=None):
+    """Действующие группы, еще не переведенные на учебный год academic_year"""
+
+    groups = Group.objects.filter(is_active=True, last_rollover_year__lt=academic_year)
+    if group_ids is not None:
+        groups = groups.filter(pk__in=group_ids)
+    return groups
+
+
+def next_target(group, academic_year):
+    """Группа, в которую переходят участники group, или None, если они выпускаются"""
+
+    tier = AGE_TIERS.index(group.age_category) + academic_year - group.last_rollover_year
+    if tier >= len(AGE_TIERS):
+        return None
+    return AGE_TIERS[tier], group.year, group.gender
+
+
+def plan_rollover(academic_year, group_ids=None):
+    """План перевода без изменений в базе (двумя запросами).
+
+        Аргументы:
+            academic_year (int): Год начала нового учебного года
+            group_ids (list, optional): Перевести только эти группы
+
+        Возвращает:
+            list: RolloverStep для каждой переводимой группы"""
+
+    groups = list(groups_to_roll(academic_year, group_ids).annotate(
+        participants=Count('students', filter=Q(students__status=STATUS_PARTICIPANT))
+    ).order_by('year', 'gender', 'age_category'))
+    existing = set(Group.objects.filter(year__in={group.year for group in groups}).values_list(
+        'age_category', 'year', 'gender'
+    ))
+    steps = []
+    for group in groups:
+        target = next_target(group, academic_year)
+        steps.append(RolloverStep(group, target, group.participants, target in existing))
+    return steps
+
+
+def describe_target(target):
+    age_category, year, gender = target
+    return f'{dict(AGE_CHOICES)[age_category]} {year}-{dict(GENDER_CHOICES)[gender]}'
+
+
+def describe_plan(steps):
+    """Строки отчета о переводе: что станет с каждой группой"""
+
+    lines = []
+    for step in steps:
+        if step.target is None:
+            lines.append(f'{step.group}: выпуск, участников {step.participants}, группа закрывается')
+        else:
+            kind = 'существующая группа' if step.target_exists else 'новая группа'
+            lines.append(
+                f'{step.group} → {describe_target(step.target)} ({kind}), участников {step.participants}'
+            )
+    return lines
+
+
+def apply_rollover(academic_year, group_ids=None):
+    """Переводит группы на учебный год academic_year в одной транзакции.
+
+    Переводимые группы блокируются до конца транзакции, поэтому одновременный
+    второй запуск дождется первого и не найдет групп для перевода.
+
+        Аргументы:
+            academic_year (int): Год начала нового учебного года
+            group_ids (list, optional): Перевести только эти группы
+
+        Возвращает:
+            tuple: (план - список RolloverStep, dict с числом переведенных и выпущенных
+                участников, созданных и закрытых групп)"""
+
+    with transaction.atomic():
+        locked = list(groups_to_roll(academic_year, group_ids).select_for_update().values_list('pk', flat=True))
+        steps = plan_rollover(academic_year, locked)
+        if not steps:
+            return steps, {'promoted': 0, 'graduated': 0, 'created': 0, 'closed': 0}
+
+        now = timezone.now()
+        source_ids = [step.group.pk for step in steps]
+        graduating_ids = [step.group.pk for step in steps if step.target is None]
+        graduated = Student.objects.filter(group_id__in=graduating_ids, status=STATUS_PARTICIPANT).update(
+            status=STATUS_GRADUATE, graduation_year=academic_year, updated_at=now
+        )
+        for group_id in graduating_ids:
+            touch_calendar(group_id)
+
+        # Закрытие идет до upsert: группа, которая сама переводится и одновременно
+        # принимает участников младшей категории, снова становится действующей
+        closed = Group.objects.filter(pk__in=source_ids).update(is_active=False, last_rollover_year=academic_year)
+
+        targets = {step.target for step in steps if step.target is not None}
+        created = len({step.target for step in steps if step.target is not None and not step.target_exists})
+        Group.objects.bulk_create(
+            [Group(age_category=age_category, year=year, gender=gender, is_active=True,
+                   last_rollover_year=academic_year) for age_category, year, gender in targets],
+            update_conflicts=True,
+            unique_fields=['age_category', 'year', 'gender'],
+            update_fields=['is_active', 'last_rollover_year'],
+        )
+        target_ids = {
+            (age_category, year, gender): pk for pk, age_category, year, gender in Group.objects.filter(
+                year__in={year for _, year, _ in targets}
+            ).values_list('pk', 'age_category', 'year', 'gender')
+        }
+        moves = {step.group.pk: target_ids[step.target] for step in steps if step.target is not None}
+
+        promoted = 0
+        if moves:
+            promoted = Student.objects.filter(group_id__in=list(moves), status=STATUS_PARTICIPANT).update(
+                group_id=Case(*[When(group_id=source, then=Value(target)) for source, target in moves.items()]),
+                updated_at=now,
+            )
+            # Составы групп меняются в обход save(): версии их календарей меняем явно
+            for group_id in set(moves) | set(moves.values()):
+                touch_calendar(group_id)
+            Teachers = Group.teachers.through
+            Teachers.objects.bulk_create([
+                Teachers(group_id=moves[group_id], user_id=user_id)
+                for group_id, user_id in Teachers.objects.filter(group_id__in=list(moves)).values_list(
+                    'group_id', 'user_id'
+                )
+            ], ignore_conflicts=True)
+
+    return steps, {'promoted': promoted, 'graduated': graduated, 'created': created, 'closed': closed}
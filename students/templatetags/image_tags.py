@@ -0,0 +1,30 @@
+from django import template
+from django.utils.html import format_html
+
+from students.thumbnails import srcset, thumbnail_url
+
+register = template.Library()
+
+
+@register.filter
+def thumbnail(field_file, width):
+    """URL превью в формате JPEG: {{ student.photo|thumbnail:96 }}"""
+    return thumbnail_url(field_file, int(width), 'jpg')
+
+
+@register.simple_tag
+def responsive_image(field_file, widths, sizes='100vw', css_class='', alt=''):
+    """Выводит <picture> с WebP-источником и JPEG-запасным вариантом.
+
+    Пример: {% responsive_image group.image "320,640,800" sizes="(min-width: 992px) 33vw, 100vw" %}"""
+
+    widths = [int(width) for width in str(widths).split(',')]
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        srcset(field_file, widths, 'webp'), sizes,
+        thumbnail_url(field_file, widths[0], 'jpg'), srcset(field_file, widths, 'jpg'), sizes,
+        css_class, alt,
+    )
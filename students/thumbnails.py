@@ -0,0 +1,111 @@
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Форматы производных изображений: WebP для современных браузеров, JPEG как запасной вариант
+THUMBNAIL_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def thumbnail_name(name, width, ext):
+    """Возвращает путь превью рядом с оригиналом: groups/images/thumbs/photo.jpg_320.webp
+
+    Имя оригинала берется целиком, с расширением: у photo.jpg и photo.png разные превью."""
+
+    directory, filename = posixpath.split(name)
+    return posixpath.join(directory, 'thumbs', f'{filename}_{width}.{ext}')
+
+
+def _render(source, width, ext):
+    """Уменьшает изображение до нужной ширины и кодирует его без EXIF-метаданных"""
+
+    pil_format, options = THUMBNAIL_FORMATS[ext]
+    with Image.open(source) as image:
+        # Поворачиваем по EXIF до того, как метаданные будут отброшены
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
+        if pil_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+        buffer = BytesIO()
+        image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def get_thumbnail(field_file, width, ext='webp'):
+    """Возвращает FieldFile-совместимый путь к превью, создавая его при первом обращении.
+
+    Превью кешируются в том же хранилище (под MEDIA_ROOT), поэтому повторные запросы
+    обходятся одной проверкой существования файла. Если оригинал недоступен или не
+    является изображением, возвращается None."""
+
+    if not field_file:
+        return None
+    storage = field_file.storage
+    name = thumbnail_name(field_file.name, width, ext)
+    if storage.exists(name):
+        return name
+    try:
+        with storage.open(field_file.name, 'rb') as source:
+            content = _render(source, width, ext)
+    except (OSError, UnidentifiedImageError) as error:
+        logger.warning('Не удалось создать превью для %s: %s', field_file.name, error)
+        return None
+    return storage.save(name, ContentFile(content))
+
+
+def thumbnail_url(field_file, width, ext='webp'):
+    """URL превью заданной ширины; при ошибке генерации — URL оригинала"""
+
+    if not field_file:
+        return ''
+    name = get_thumbnail(field_file, width, ext)
+    return field_file.storage.url(name) if name else field_file.url
+
+
+def srcset(field_file, widths, ext='webp'):
+    """Строка для атрибута srcset: 'url_320 320w, url_640 640w'"""
+
+    if not field_file:
+        return ''
+    return ', '.join(f'{thumbnail_url(field_file, width, ext)} {width}w' for width in widths)
+
+
+def delete_thumbnails(storage, name, widths):
+    """Удаляет все превью файла name (отсутствующие пропускаются)"""
+
+    for width in widths:
+        for ext in THUMBNAIL_FORMATS:
+            storage.delete(thumbnail_name(name, width, ext))
+
+
+def stored_file_name(instance, field_name):
+    """Имя файла, записанное в базе для instance до сохранения (None для новой записи)"""
+
+    if instance.pk is None:
+        return None
+    return type(instance)._default_manager.filter(pk=instance.pk).values_list(field_name, flat=True).first()
+
+
+def generate_thumbnails(field_file, widths, previous_name=None):
+    """Заранее создает все превью для загруженного файла (вызывается при сохранении модели).
+
+    Превью, оставшиеся от прежнего файла с тем же именем, пересоздаются; превью
+    замененного файла previous_name удаляются."""
+
+    if previous_name and previous_name != field_file.name:
+        delete_thumbnails(field_file.storage, previous_name, widths)
+    delete_thumbnails(field_file.storage, field_file.name, widths)
+    for width in widths:
+        for ext in THUMBNAIL_FORMATS:
+            get_thumbnail(field_file, width, ext)
@@ -1,5 +1,9 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404
+from django.views import View
 from django.views.generic import TemplateView, ListView
 
+from config.media import is_protected_media, protected_file_response
 from students.models import Student, Group
 
 
@@ -16,6 +20,9 @@ class StudentsListView(ListView):
     template_name = 'students/students_list.html'
     context_object_name = 'students'
 
+    def get_queryset(self):
+        return Student.objects.active().select_related('group')
+
     def get_context_data(self, **kwargs):
         """Добавляем список групп в контекст"""
 
@@ -23,3 +30,14 @@ class StudentsListView(ListView):
         context['unique_groups'] = Group.objects.filter(is_active=True).order_by('id')
 
         return context
+
+
+class ProtectedMediaView(LoginRequiredMixin, View):
+    """Контроллер защищенных медиафайлов (фото участников, выгрузки).
+
+    Django только проверяет авторизацию, а сам файл отдает nginx по X-Accel-Redirect"""
+
+    def get(self, request, path):
+        if not is_protected_media(path):
+            raise Http404('Файл не найден')
+        return protected_file_response(path)
@@ -3,6 +3,7 @@ from django.contrib.auth.admin import UserAdmin
 from django.utils.translation import gettext_lazy as _
 from django.utils.html import format_html
 
+from students.thumbnails import thumbnail_url
 from users.models import User
 
 
@@ -39,7 +40,7 @@ class CustomUserAdmin(UserAdmin):
 
     def avatar_preview(self, obj):
         if obj.avatar:
-            return format_html('<img src="{}" width="50" height="50" />'.format(obj.avatar.url))
+            return format_html('<img src="{}" width="50" height="50" />', thumbnail_url(obj.avatar, 100, 'jpg'))
         return "-"
 
     avatar_preview.short_description = _('Avatar Preview')
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    """Удаление просроченных сессий из таблицы django_session.
+
+    В отличие от clearsessions удаляет строки небольшими пачками, чтобы не держать
+    долгую блокировку таблицы, к которой в это время обращаются работающие воркеры.
+    Запускать по расписанию, например раз в сутки через cron:
+        python manage.py purge_expired_sessions"""
+
+    help = 'Удаляет просроченные сессии пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Сессий в одном DELETE')
+        parser.add_argument('--pause', type=float, default=0.0, help='Пауза между пачками, секунд')
+
+    def handle(self, *args, **options):
+        if settings.SESSION_ENGINE.endswith('signed_cookies'):
+            self.stdout.write('Сессии хранятся в cookie, таблица django_session не используется')
+            return
+
+        now = timezone.now()
+        deleted = 0
+        while True:
+            expired = Session.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)
+            keys = list(expired[:options['batch_size']])
+            if not keys:
+                break
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено просроченных сессий: {deleted}'))
@@ -2,8 +2,12 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from students.thumbnails import generate_thumbnails, stored_file_name
 from users.managers import UserManager
 
+# Ширины превью аватара (px): админка и страница профиля
+AVATAR_WIDTHS = (100, 300)
+
 
 class User(AbstractUser):
     """Кастомная модель пользователя с отключенным полем username и подключенным кастомным менеджером"""
@@ -41,3 +45,10 @@ class User(AbstractUser):
 
     def __str__(self):
         return self.email
+
+    def save(self, *args, **kwargs):
+        uploaded = bool(self.avatar) and not self.avatar._committed
+        previous = stored_file_name(self, 'avatar') if uploaded else None
+        super().save(*args, **kwargs)
+        if uploaded:
+            generate_thumbnails(self.avatar, AVATAR_WIDTHS, previous)